@@ -12,14 +12,16 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import requests
 from crawler import StackCrawler
-from storage import JSONStorage
+from storage import create_storage, export_line, stale_stack_names
 from models import Stack
+from rate_governor import RateLimited
 
 
 class CurrentCLI:
     def __init__(self):
-        self.storage = JSONStorage()
+        self.storage = create_storage()
         self.crawler = StackCrawler()
+        self.crawler.history = self.storage.history
     
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from kiro.config.json"""
@@ -42,46 +44,80 @@ class CurrentCLI:
             print(f"❌ Error saving configuration: {e}")
             sys.exit(1)
     
-    def update_stacks(self, fast_only: bool = False):
-        """Update stack data"""
+    def update_stacks(self, fast_only: bool = False, names: Optional[List[str]] = None,
+                      categories: Optional[List[str]] = None, stale_days: Optional[int] = None):
+        """Update stack data, optionally only a subset by name, category or staleness"""
         config = self.load_config()
-        stacks_to_update = []
+        stacks_to_update = self.crawler.select_stack_names(names, categories, fast_only)
         
-        if fast_only:
+        if names:
+            unknown = [name for name in names if name.lower() not in config.get('sources', {})]
+            for name in unknown:
+                print(f"⚠️  '{name}' is not a configured stack, skipping")
+        if stale_days is not None:
+            stale = stale_stack_names(self.storage, stacks_to_update, stale_days)
+            stacks_to_update = [name for name in stacks_to_update if name in stale]
+        
+        if names or categories or stale_days is not None:
+            print(f"🎯 Updating {len(stacks_to_update)} selected stacks...")
+        elif fast_only:
             # Only update fast-moving stacks (daily updates)
-            fast_moving = ['react', 'vue', 'angular', 'svelte', 'next.js', 'nuxt.js', 
-                          'express', 'fastapi', 'django', 'flask', 'tailwindcss']
-            stacks_to_update = [name for name in config.get('stacks', {}).keys() 
-                              if name.lower() in fast_moving]
             print(f"🚀 Updating {len(stacks_to_update)} fast-moving stacks...")
         else:
-            stacks_to_update = list(config.get('stacks', {}).keys())
             print(f"🔄 Updating all {len(stacks_to_update)} stacks...")
         
         updated_count = 0
         failed_count = 0
+        deferred_count = 0
         
-        for stack_name in stacks_to_update:
-            try:
-                print(f"📦 Updating {stack_name}...")
-                stack_config = config['stacks'][stack_name]
-                stack_data = self.crawler.crawl_stack(stack_name, stack_config)
-                
-                if stack_data:
-                    self.storage.save_stack(stack_data)
-                    updated_count += 1
-                    print(f"✅ {stack_name} updated successfully")
-                else:
-                    failed_count += 1
-                    print(f"❌ Failed to update {stack_name}")
+        stale: Dict[str, Stack] = {}
+        
+        # Stacks are crawled concurrently; each is saved as soon as it finishes.
+        # Stored values fill in for any source that fails this time.
+        # A manual run wants upstream's current data, even within the cache TTL.
+        previous = self.storage.get_stacks(stacks_to_update)
+        with self.crawler.revalidating():
+            for stack_name, stack_data, error in self.crawler.crawl_many(stacks_to_update, previous):
+                try:
+                    if stack_data:
+                        self.storage.save_stack(stack_name, stack_data)
+                        updated_count += 1
+                        if stack_data.stale_fields:
+                            stale[stack_name] = stack_data
+                            print(f"⚠️  {stack_name} updated, kept last known {', '.join(stack_data.stale_fields)}")
+                        else:
+                            print(f"✅ {stack_name} updated successfully")
+                    elif isinstance(error, RateLimited):
+                        deferred_count += 1
+                        print(f"⏳ {stack_name} deferred: {error}")
+                    else:
+                        failed_count += 1
+                        print(f"❌ Failed to update {stack_name}: {error}")
                     
-            except Exception as e:
-                failed_count += 1
-                print(f"❌ Error updating {stack_name}: {e}")
+                except Exception as e:
+                    failed_count += 1
+                    print(f"❌ Error updating {stack_name}: {e}")
+        
+        # One more try for just the sources that failed, not the whole stack
+        recovered_count = 0
+        for stack_name, stack_data in stale.items():
+            for source in self.crawler.stale_sources(stack_data):
+                try:
+                    fields = self.crawler.refetch_source(stack_name, source)
+                    stack_data = self.crawler.merge_source(stack_data, source, fields)
+                    recovered_count += 1
+                except Exception as e:
+                    print(f"⚠️  Retry of {source} for {stack_name} failed: {e}")
+            if stack_data is not stale[stack_name]:
+                self.storage.save_stack(stack_name, stack_data)
         
         print(f"\n📊 Update Summary:")
         print(f"✅ Successfully updated: {updated_count}")
         print(f"❌ Failed: {failed_count}")
+        if stale:
+            print(f"🔁 Failed sources recovered on retry: {recovered_count}")
+        if deferred_count:
+            print(f"⏳ Deferred by rate limits: {deferred_count} (re-run after the reset)")
         print(f"📈 Total stacks: {len(stacks_to_update)}")
     
     def list_stacks(self, category: Optional[str] = None):
@@ -125,18 +161,16 @@ class CurrentCLI:
             print(f"❌ Stack '{name}' not found")
             return
         
-        print(f"📦 {stack_data.name}")
-        print(f"📝 {stack_data.description}")
-        print(f"🏷️  Category: {stack_data.category}")
-        print(f"🌐 Website: {stack_data.website}")
-        print(f"📂 Repository: {stack_data.repository}")
-        print(f"📊 Downloads: {stack_data.downloads:,}")
-        print(f"⭐ Stars: {stack_data.stars:,}")
-        print(f"🍴 Forks: {stack_data.forks:,}")
-        print(f"📅 Last Updated: {stack_data.last_updated}")
-        
-        if stack_data.tags:
-            print(f"🏷️  Tags: {', '.join(stack_data.tags)}")
+        print(f"📦 {stack_data.name} v{stack_data.latest_version}")
+        print(f"🏷️  Category: {stack_data.category.value}")
+        print(f"💻 Language: {stack_data.language}")
+        print(f"🌐 Docs: {stack_data.docs_url}")
+        print(f"📂 Repository: {stack_data.github_url or '-'}")
+        print(f"📊 Downloads: {stack_data.downloads_weekly or 0:,}/week, {stack_data.downloads_monthly or 0:,}/month")
+        print(f"⭐ Stars: {stack_data.github_stars or 0:,}")
+        print(f"🍴 Forks: {stack_data.github_forks or 0:,}")
+        print(f"📅 Released: {stack_data.release_date}")
+        print(f"🔄 Last Checked: {stack_data.last_checked}")
     
     def search_stacks(self, query: str):
         """Search stacks by name or description"""
@@ -221,6 +255,37 @@ class CurrentCLI:
             else:
                 print(f"  📦 {name} - unknown")
     
+    def migrate_sqlite(self, source: Optional[str] = None, db_path: Optional[str] = None):
+        """Import an existing stacks_data.json into the SQLite backend"""
+        from storage import JSONStorage
+        from sqlite_storage import SQLiteStorage
+
+        source = source or JSONStorage().file_path
+        print(f"🗄️  Migrating {source} into SQLite...")
+        try:
+            sqlite_storage = SQLiteStorage(db_path)
+            count = sqlite_storage.import_json(source)
+        except FileNotFoundError:
+            print(f"❌ {source} not found")
+            sys.exit(1)
+
+        print(f"✅ Imported {count} stacks into {sqlite_storage.file_path}")
+        print("Set STORAGE_BACKEND=sqlite to serve from the new database")
+    
+    def export_stacks(self, output: Optional[str] = None):
+        """Write every stack as newline-delimited JSON to a file or stdout"""
+        out = open(output, 'w') if output else sys.stdout
+        count = 0
+        try:
+            for name, stack in self.storage.iter_stacks():
+                out.write(export_line(name, stack))
+                count += 1
+        finally:
+            if output:
+                out.close()
+        # Keep stdout clean for piping
+        print(f"✅ Exported {count} stacks{f' to {output}' if output else ''}", file=sys.stderr)
+    
     def add_stack(self):
         """Interactive stack addition"""
         print("🆕 Adding a new stack to configuration")
@@ -296,6 +361,12 @@ def main():
     update_parser = subparsers.add_parser('update-stacks', help='Update stack data')
     update_parser.add_argument('--fast', action='store_true', 
                               help='Update only fast-moving stacks')
+    update_parser.add_argument('--names', nargs='+', metavar='NAME',
+                              help='Update only these stacks')
+    update_parser.add_argument('--category', nargs='+', metavar='CATEGORY',
+                              help='Update only stacks in these categories')
+    update_parser.add_argument('--stale-days', type=int, metavar='DAYS',
+                              help="Update only stacks not checked in DAYS days (or never)")
     
     # List stacks command
     list_parser = subparsers.add_parser('list', help='List all stacks')
@@ -323,6 +394,15 @@ def main():
     # Add stack command
     subparsers.add_parser('add-stack', help='Add a new stack interactively')
     
+    # Export command
+    export_parser = subparsers.add_parser('export', help='Export all stacks as NDJSON')
+    export_parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    
+    # Migrate to SQLite command
+    migrate_parser = subparsers.add_parser('migrate-sqlite', help='Import JSON storage into SQLite')
+    migrate_parser.add_argument('--source', help='Path to stacks JSON file (default: current JSON storage file)')
+    migrate_parser.add_argument('--db', help='Path to SQLite database (default: SQLITE_PATH or stacks.db)')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -333,7 +413,8 @@ def main():
     
     try:
         if args.command == 'update-stacks':
-            cli.update_stacks(fast_only=args.fast)
+            cli.update_stacks(fast_only=args.fast, names=args.names,
+                              categories=args.category, stale_days=args.stale_days)
         elif args.command == 'list':
             cli.list_stacks(category=args.category)
         elif args.command == 'show':
@@ -346,11 +427,17 @@ def main():
             cli.outdated_stacks(days=args.days)
         elif args.command == 'add-stack':
             cli.add_stack()
+        elif args.command == 'export':
+            cli.export_stacks(output=args.output)
+        elif args.command == 'migrate-sqlite':
+            cli.migrate_sqlite(source=args.source, db_path=args.db)
     except KeyboardInterrupt:
         print("\n👋 Goodbye!")
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
+    finally:
+        cli.crawler.close()
 
 
 if __name__ == '__main__':
@@ -1,19 +1,165 @@
 import requests
 import json
+import os
 import re
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from models import Stack, InstallCommands, StackCategory
+from http_client import RequestLimiter, create_session
+from upstream_cache import UpstreamCache
+from rate_governor import RateGovernor, RateLimited
+
+# Daily counts for the last 30 days; also takes up to 128 comma-separated unscoped packages
+NPM_DOWNLOADS_RANGE = "https://api.npmjs.org/downloads/range/last-month"
+NPM_BULK_LIMIT = 128
+GITHUB_API = "https://api.github.com/"
+GITHUB_GRAPHQL = "https://api.github.com/graphql"
+GITHUB_RATE_LIMIT = "https://api.github.com/rate_limit"
+
+# Stack fields filled by each source; when a source fails they keep their previous values
+SOURCE_FIELDS = {
+    'version': ('latest_version', 'release_date'),
+    'downloads': ('downloads_weekly', 'downloads_monthly'),
+    'github': ('github_stars', 'github_forks'),
+}
+
+
+def _not_found(error: Exception) -> bool:
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 404
 
 class StackCrawler:
     def __init__(self, config_path: str = "kiro.config.json"):
         # Handle Railway deployment path
-        import os
         if not os.path.exists(config_path) and os.path.exists(f"/app/{config_path}"):
             config_path = f"/app/{config_path}"
         
         with open(config_path, 'r') as f:
             self.config = json.load(f)
+        
+        # Stacks crawled at once, and the limits on their upstream requests
+        self.concurrency = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+        self.limiter = RequestLimiter()
+        # Per-host rate budgets learned from response headers
+        self.governor = RateGovernor()
+        # Validators and payloads of earlier responses, for conditional requests
+        self.upstream_cache = None
+        if os.getenv("UPSTREAM_CACHE", "true").lower() in ("1", "true", "yes"):
+            self.upstream_cache = UpstreamCache()
+        # Crawls in progress that must revalidate even TTL-fresh cache entries
+        self._revalidating = 0
+        # Set by the storage owner so daily npm download series are kept
+        self.history = None
+        # GitHub token for GraphQL batching and the higher authenticated REST limit
+        self.github_token = os.getenv("GITHUB_TOKEN") or None
+        self.github_batch_size = int(os.getenv("GITHUB_GRAPHQL_BATCH", "50"))
+        # One keep-alive pool per host, as large as the most that host may have in flight
+        self.session = create_session(max([self.limiter.per_host, *self.limiter.host_limits.values()]))
+        self._fetch_pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+    
+    def _github_headers(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+        """Add the GitHub token to requests bound for the GitHub API only"""
+        if not self.github_token or not url.startswith(GITHUB_API):
+            return headers
+        return {**(headers or {}), 'Authorization': f"Bearer {self.github_token}"}
+    
+    def _send(self, method: str, url: str, timeout: float, headers: Optional[Dict[str, str]] = None,
+              **kwargs) -> requests.Response:
+        """Send a request within the host's rate budget and the concurrency limits
+        
+        Raises RateLimited instead of sending when the budget is spent, and
+        when the host answers with a rate-limit rejection. The fetch_* methods
+        let it propagate rather than return zeros, so crawl_many() can defer
+        the stack.
+        """
+        # Wait for budget before taking a slot, so waiting doesn't block other hosts
+        self.governor.acquire(url)
+        with self.limiter.slot(url):
+            response = self.session.request(method, url, timeout=timeout,
+                                            headers=self._github_headers(url, headers), **kwargs)
+        limited = self.governor.update(url, response.status_code, response.headers)
+        if limited:
+            raise limited
+        return response
+    
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        return self._send('GET', url, 10, **kwargs)
+    
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        return self._send('POST', url, 30, **kwargs)
+    
+    @contextmanager
+    def revalidating(self):
+        """Revalidate cached responses within their TTL for the duration
+        
+        For manual refreshes, which want what upstream has now rather than
+        what it had within the last hour. A 304 still costs next to nothing.
+        """
+        self.begin_revalidation()
+        try:
+            yield
+        finally:
+            self.end_revalidation()
+    
+    def begin_revalidation(self):
+        """Start revalidating TTL-fresh responses; pair with end_revalidation()"""
+        with self._pool_lock:
+            self._revalidating += 1
+    
+    def end_revalidation(self):
+        with self._pool_lock:
+            self._revalidating -= 1
+    
+    def _get_json(self, url: str, strict: bool = True) -> Optional[Any]:
+        """GET a JSON body, revalidating against the upstream cache when there is one
+        
+        Error statuses raise when strict. Otherwise a 4xx (e.g. a package the
+        stats service doesn't track) returns None, and only server errors raise.
+        """
+        cached = self.upstream_cache.get(url) if self.upstream_cache else None
+        validators = None
+        if cached:
+            payload, validators, fresh = cached
+            if fresh and not self._revalidating:
+                return payload
+        
+        response = self._get(url, headers=validators)
+        if response.status_code == 304 and cached:
+            self.upstream_cache.touch(url)
+            return payload
+        if response.status_code != 200:
+            if strict or response.status_code >= 500:
+                response.raise_for_status()
+                raise requests.HTTPError(f"Unexpected status {response.status_code} for {url}", response=response)
+            return None
+        
+        payload = response.json()
+        if self.upstream_cache:
+            self.upstream_cache.store(url, payload, response.headers.get('ETag'),
+                                      response.headers.get('Last-Modified'))
+        return payload
+    
+    def fetch_pool(self) -> ThreadPoolExecutor:
+        """Shared pool running the independent fetches of each stack"""
+        with self._pool_lock:
+            if self._fetch_pool is None:
+                # Threads beyond the global request limit would only wait on it
+                self._fetch_pool = ThreadPoolExecutor(
+                    max_workers=self.limiter.max_requests, thread_name_prefix='crawl-fetch'
+                )
+            return self._fetch_pool
+    
+    def close(self):
+        """Stop the fetch pool's worker threads and close pooled connections"""
+        with self._pool_lock:
+            if self._fetch_pool is not None:
+                self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+                self._fetch_pool = None
+        self.session.close()
     
     def normalize_version(self, version: str) -> str:
         """Strip 'v' prefix and normalize to semver format"""
@@ -27,93 +173,196 @@ class StackCrawler:
             parts.append('0')
         return '.'.join(parts[:3])
     
-    def fetch_npm_data(self, package_name: str) -> Optional[Dict[str, Any]]:
+    def fetch_npm_data(self, package_name: str, strict: bool = False) -> Optional[Dict[str, Any]]:
         """Fetch package data from npm registry"""
         try:
             url = f"https://registry.npmjs.org/{package_name}/latest"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json(url)
         except Exception as e:
+            if strict or isinstance(e, RateLimited):
+                raise
             print(f"Error fetching npm data for {package_name}: {e}")
             return None
     
-    def fetch_npm_downloads(self, package_name: str) -> Dict[str, int]:
-        """Fetch npm download statistics"""
+    def _npm_totals(self, series: List[Tuple[str, int]]) -> Dict[str, Any]:
+        """Weekly and monthly totals from a last-month daily series"""
+        return {
+            "weekly": sum(downloads for _, downloads in series[-7:]),
+            "monthly": sum(downloads for _, downloads in series),
+            "daily": series
+        }
+    
+    def _npm_series(self, data: Dict[str, Any]) -> List[Tuple[str, int]]:
+        return [(day['day'], day.get('downloads', 0)) for day in data.get('downloads') or []]
+    
+    def fetch_npm_downloads(self, package_name: str, strict: bool = False) -> Dict[str, Any]:
+        """Fetch npm download statistics from one daily range of the last month"""
         downloads = {"weekly": 0, "monthly": 0}
         try:
-            # Weekly downloads
-            weekly_url = f"https://api.npmjs.org/downloads/point/last-week/{package_name}"
-            weekly_response = requests.get(weekly_url, timeout=10)
-            if weekly_response.status_code == 200:
-                weekly_data = weekly_response.json()
-                downloads["weekly"] = weekly_data.get("downloads", 0)
-            
-            # Monthly downloads
-            monthly_url = f"https://api.npmjs.org/downloads/point/last-month/{package_name}"
-            monthly_response = requests.get(monthly_url, timeout=10)
-            if monthly_response.status_code == 200:
-                monthly_data = monthly_response.json()
-                downloads["monthly"] = monthly_data.get("downloads", 0)
-                
+            url = f"{NPM_DOWNLOADS_RANGE}/{package_name}"
+            data = self._get_json(url, strict=False)
+            if data:
+                downloads = self._npm_totals(self._npm_series(data))
         except Exception as e:
+            if strict or isinstance(e, RateLimited):
+                raise
             print(f"Error fetching npm downloads for {package_name}: {e}")
         
         return downloads
     
-    def fetch_pypi_data(self, package_name: str) -> Optional[Dict[str, Any]]:
+    def fetch_npm_downloads_bulk(self, packages: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch download statistics for up to 128 unscoped packages in one request
+        
+        Packages missing from the result should be fetched one at a time.
+        """
+        try:
+            data = self._get_json(f"{NPM_DOWNLOADS_RANGE}/{','.join(packages)}")
+        except Exception as e:
+            print(f"Error fetching npm downloads for {len(packages)} packages: {e}")
+            return {}
+        if not data:
+            return {}
+        if 'package' in data:
+            # A single-package query comes back unwrapped
+            data = {data['package']: data}
+        return {
+            package: self._npm_totals(self._npm_series(entry))
+            for package, entry in data.items() if entry
+        }
+    
+    def prefetch_npm_downloads(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Bulk-fetch download statistics for the npm packages of the given stacks"""
+        sources = self.config.get('sources', {})
+        # The bulk endpoint doesn't accept scoped packages; those are fetched singly
+        packages = sorted({
+            sources[name]['npm'] for name in names
+            if 'npm' in sources.get(name, {}) and not sources[name]['npm'].startswith('@')
+        })
+        if len(packages) < 2:
+            return {}
+        batches = [packages[i:i + NPM_BULK_LIMIT] for i in range(0, len(packages), NPM_BULK_LIMIT)]
+        results = {}
+        for batch in self.fetch_pool().map(self.fetch_npm_downloads_bulk, batches):
+            results.update(batch)
+        print(f"npm downloads: {len(results)}/{len(packages)} packages in {len(batches)} requests")
+        return results
+    
+    def fetch_pypi_data(self, package_name: str, strict: bool = False) -> Optional[Dict[str, Any]]:
         """Fetch package data from PyPI"""
         try:
             url = f"https://pypi.org/pypi/{package_name}/json"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json(url)
         except Exception as e:
+            if strict or isinstance(e, RateLimited):
+                raise
             print(f"Error fetching PyPI data for {package_name}: {e}")
             return None
     
-    def fetch_pypi_downloads(self, package_name: str) -> Dict[str, int]:
+    def fetch_pypi_downloads(self, package_name: str, strict: bool = False) -> Dict[str, int]:
         """Fetch PyPI download statistics"""
         downloads = {"weekly": 0, "monthly": 0}
         try:
             # Try pypistats API for recent downloads
             url = f"https://pypistats.org/api/packages/{package_name}/recent"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
+            data = self._get_json(url, strict=False)
+            if data:
                 if "data" in data:
                     downloads["weekly"] = data["data"].get("last_week", 0)
                     downloads["monthly"] = data["data"].get("last_month", 0)
         except Exception as e:
+            if strict or isinstance(e, RateLimited):
+                raise
             print(f"Error fetching PyPI downloads for {package_name}: {e}")
         
         return downloads
     
-    def fetch_github_release(self, repo: str) -> Optional[Dict[str, Any]]:
+    def fetch_github_release(self, repo: str, strict: bool = False) -> Optional[Dict[str, Any]]:
         """Fetch latest release from GitHub"""
         try:
             url = f"https://api.github.com/repos/{repo}/releases/latest"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json(url)
         except Exception as e:
+            if strict or isinstance(e, RateLimited):
+                raise
             print(f"Error fetching GitHub data for {repo}: {e}")
             return None
     
-    def fetch_github_stats(self, repo: str) -> Dict[str, int]:
+    def fetch_github_stats(self, repo: str, strict: bool = False) -> Dict[str, int]:
         """Fetch GitHub repository statistics"""
         stats = {"stars": 0, "forks": 0}
         try:
             url = f"https://api.github.com/repos/{repo}"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json(url)
             stats["stars"] = data.get("stargazers_count", 0)
             stats["forks"] = data.get("forks_count", 0)
         except Exception as e:
+            if strict or isinstance(e, RateLimited):
+                raise
             print(f"Error fetching GitHub stats for {repo}: {e}")
         
         return stats 
+    
+    def fetch_github_batch(self, repos: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch stars, forks and latest release of many repos in one GraphQL query
+        
+        Returns {repo: {"stars", "forks", "release"}} with release shaped like
+        fetch_github_release() (or None when the repo has no releases). Repos
+        missing from the result (not found, or the query failed) should be
+        fetched over REST instead.
+        """
+        if not self.github_token or not repos:
+            return {}
+        
+        # One aliased repository() field per repo; JSON strings are valid GraphQL strings
+        fields = []
+        for i, repo in enumerate(repos):
+            owner, _, name = repo.partition('/')
+            fields.append(
+                f"r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) "
+                "{ stargazerCount forkCount latestRelease { tagName publishedAt } }"
+            )
+        query = "query { " + " ".join(fields) + " }"
+        
+        try:
+            response = self._post(GITHUB_GRAPHQL, json={'query': query})
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            print(f"Error fetching GitHub GraphQL batch of {len(repos)} repos: {e}")
+            return {}
+        
+        if body.get('errors'):
+            # Typically NOT_FOUND for renamed or deleted repos; the rest still resolve
+            print(f"GitHub GraphQL batch: {len(body['errors'])} repos failed, falling back to REST")
+        data = body.get('data') or {}
+        results = {}
+        for i, repo in enumerate(repos):
+            node = data.get(f"r{i}")
+            if not node:
+                continue
+            release = node.get('latestRelease')
+            results[repo] = {
+                'stars': node.get('stargazerCount', 0),
+                'forks': node.get('forkCount', 0),
+                'release': {
+                    'tag_name': release.get('tagName', ''),
+                    'published_at': release.get('publishedAt', '')
+                } if release else None
+            }
+        return results
+    
+    def prefetch_github(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Batch-fetch GitHub data for the repos of the given stacks (empty without a token)"""
+        if not self.github_token:
+            return {}
+        sources = self.config.get('sources', {})
+        repos = sorted({sources[name]['github'] for name in names if 'github' in sources.get(name, {})})
+        batches = [repos[i:i + self.github_batch_size] for i in range(0, len(repos), self.github_batch_size)]
+        results = {}
+        for batch in self.fetch_pool().map(self.fetch_github_batch, batches):
+            results.update(batch)
+        print(f"GitHub GraphQL: {len(results)}/{len(repos)} repos in {len(batches)} requests")
+        return results
    
     def create_install_commands(self, stack_name: str, language: str, npm_package: str = None, pypi_package: str = None) -> InstallCommands:
         """Generate install commands based on package type"""
@@ -163,132 +412,318 @@ class StackCrawler:
         
         return category_mapping.get(category_str, StackCategory.OTHER)
     
-    def crawl_stack(self, stack_name: str, config: Dict[str, Any]) -> Optional[Stack]:
-        """Crawl a single stack and return Stack object with popularity metrics"""
-        try:
-            version = None
-            release_date = None
-            github_url = None
-            github_stars = 0
-            github_forks = 0
-            downloads_weekly = 0
-            downloads_monthly = 0
-            
-            # Try npm first
-            if 'npm' in config:
-                npm_data = self.fetch_npm_data(config['npm'])
-                if npm_data:
-                    version = self.normalize_version(npm_data.get('version', ''))
-                    release_date = npm_data.get('time', {}).get(npm_data.get('version'), '')
-                
-                # Fetch npm download stats
-                npm_downloads = self.fetch_npm_downloads(config['npm'])
-                downloads_weekly = npm_downloads.get('weekly', 0)
-                downloads_monthly = npm_downloads.get('monthly', 0)
-            
-            # Try PyPI if npm failed or not available
-            if not version and 'pypi' in config:
-                pypi_data = self.fetch_pypi_data(config['pypi'])
-                if pypi_data:
-                    info = pypi_data.get('info', {})
-                    version = self.normalize_version(info.get('version', ''))
-                    release_date = datetime.now().isoformat()
-                
-                # Fetch PyPI download stats
-                pypi_downloads = self.fetch_pypi_downloads(config['pypi'])
-                downloads_weekly = pypi_downloads.get('weekly', 0)
-                downloads_monthly = pypi_downloads.get('monthly', 0)
-            
-            # Try GitHub if others failed
-            if not version and 'github' in config:
-                github_data = self.fetch_github_release(config['github'])
+    def fetch_version_source(self, config: Dict[str, Any],
+                             github: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """latest_version and release_date from npm, then PyPI, then GitHub releases
+        
+        Returns {} when no source has a version, and raises when one that
+        might have had it failed (a 404 counts as "no version there").
+        """
+        version = None
+        release_date = None
+        failure: Optional[Exception] = None
+        
+        # Try npm first
+        if 'npm' in config:
+            try:
+                data = self.fetch_npm_data(config['npm'], strict=True)
+                version = self.normalize_version(data.get('version', ''))
+                release_date = data.get('time', {}).get(data.get('version'), '')
+            except RateLimited:
+                raise
+            except Exception as e:
+                failure = None if _not_found(e) else e
+        
+        # Try PyPI if npm failed or not available
+        if not version and 'pypi' in config:
+            try:
+                data = self.fetch_pypi_data(config['pypi'], strict=True)
+                info = data.get('info', {})
+                version = self.normalize_version(info.get('version', ''))
+                release_date = datetime.now().isoformat()
+            except RateLimited:
+                raise
+            except Exception as e:
+                failure = failure or (None if _not_found(e) else e)
+        
+        # Try GitHub if others failed
+        if not version and 'github' in config:
+            try:
+                if github is not None:
+                    github_data = github['release']
+                else:
+                    github_data = self.fetch_github_release(config['github'], strict=True)
                 if github_data:
                     version = self.normalize_version(github_data.get('tag_name', ''))
                     release_date = github_data.get('published_at', '')
-            
-            # Always fetch GitHub stats if available
-            if 'github' in config:
-                github_url = f"https://github.com/{config['github']}"
-                github_stats = self.fetch_github_stats(config['github'])
-                github_stars = github_stats.get('stars', 0)
-                github_forks = github_stats.get('forks', 0)
-            
-            if not version:
-                print(f"Could not fetch version for {stack_name}")
-                return None
-            
-            # Format release date
-            if release_date:
-                try:
-                    dt = datetime.fromisoformat(release_date.replace('Z', '+00:00'))
-                    release_date = dt.strftime('%Y-%m-%d')
-                except:
-                    release_date = datetime.now().strftime('%Y-%m-%d')
-            else:
+            except RateLimited:
+                raise
+            except Exception as e:
+                failure = failure or (None if _not_found(e) else e)
+        
+        if not version:
+            if failure:
+                raise failure
+            return {}
+        
+        # Format release date
+        if release_date:
+            try:
+                dt = datetime.fromisoformat(release_date.replace('Z', '+00:00'))
+                release_date = dt.strftime('%Y-%m-%d')
+            except:
                 release_date = datetime.now().strftime('%Y-%m-%d')
-            
-            # Create install commands
-            install_commands = self.create_install_commands(
-                stack_name,
-                config.get('language', 'Unknown'),
-                config.get('npm'),
-                config.get('pypi')
-            )
-            
-            # Get category
-            category = self.get_stack_category(stack_name)
-            
-            return Stack(
-                name=stack_name.title(),
-                language=config.get('language', 'Unknown'),
-                latest_version=version,
-                release_date=release_date,
-                docs_url=config['docs_url'],
-                github_url=github_url,
-                install=install_commands,
-                github_stars=github_stars,
-                github_forks=github_forks,
-                downloads_weekly=downloads_weekly,
-                downloads_monthly=downloads_monthly,
-                last_checked=datetime.now(),
-                category=category,
-                last_updated=datetime.now()
-            )
-            
+        else:
+            release_date = datetime.now().strftime('%Y-%m-%d')
+        return {'latest_version': version, 'release_date': release_date}
+    
+    def fetch_download_source(self, stack_name: str, config: Dict[str, Any],
+                              npm_downloads: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """downloads_weekly and downloads_monthly from npm, or PyPI for Python stacks"""
+        if 'npm' in config:
+            downloads = npm_downloads
+            if downloads is None:
+                downloads = self.fetch_npm_downloads(config['npm'], strict=True)
+            if self.history and downloads.get('daily'):
+                self.history.record_daily_downloads(stack_name, downloads['daily'])
+        elif 'pypi' in config:
+            downloads = self.fetch_pypi_downloads(config['pypi'], strict=True)
+        else:
+            return {}
+        return {
+            'downloads_weekly': downloads.get('weekly', 0),
+            'downloads_monthly': downloads.get('monthly', 0)
+        }
+    
+    def fetch_github_source(self, config: Dict[str, Any],
+                            github: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """github_stars and github_forks from the GraphQL batch entry or REST"""
+        stats = github if github is not None else self.fetch_github_stats(config['github'], strict=True)
+        return {'github_stars': stats.get('stars', 0), 'github_forks': stats.get('forks', 0)}
+    
+    def _fetch_source(self, source: str, stack_name: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        if source == 'version':
+            fields = self.fetch_version_source(config)
+            if not fields:
+                raise ValueError(f"Could not fetch version for {stack_name}")
+            return fields
+        if source == 'downloads':
+            return self.fetch_download_source(stack_name, config)
+        return self.fetch_github_source(config)
+    
+    def fetch_stack(self, stack_name: str, config: Dict[str, Any],
+                    github: Optional[Dict[str, Any]] = None,
+                    npm_downloads: Optional[Dict[str, Any]] = None,
+                    previous: Optional[Stack] = None) -> Stack:
+        """Crawl a single stack, raising if no version can be found
+        
+        github and npm_downloads are the stack's entries from the batched
+        prefetches in crawl_many(), replacing the per-stack calls when given.
+        When a source fails, its fields keep their values from previous (the
+        stored stack) and are listed in stale_fields for a later retry.
+        """
+        # The three sources are independent, so they run concurrently
+        pool = self.fetch_pool()
+        futures = {
+            'version': pool.submit(self.fetch_version_source, config, github),
+            'downloads': pool.submit(self.fetch_download_source, stack_name, config, npm_downloads),
+        }
+        if 'github' in config:
+            futures['github'] = pool.submit(self.fetch_github_source, config, github)
+        
+        fields: Dict[str, Any] = {}
+        stale_fields: List[str] = []
+        for source, future in futures.items():
+            try:
+                fields.update(future.result())
+            except RateLimited:
+                raise
+            except Exception as e:
+                if previous is None and source == 'version':
+                    raise ValueError(f"Could not fetch version for {stack_name}: {e}")
+                print(f"⚠️  {stack_name}: {source} fetch failed ({e}), keeping last known values")
+                for field in SOURCE_FIELDS[source]:
+                    if previous is not None:
+                        fields[field] = getattr(previous, field)
+                    stale_fields.append(field)
+        
+        if not fields.get('latest_version'):
+            raise ValueError(f"Could not fetch version for {stack_name}")
+        
+        # Create install commands
+        install_commands = self.create_install_commands(
+            stack_name,
+            config.get('language', 'Unknown'),
+            config.get('npm'),
+            config.get('pypi')
+        )
+        
+        # Get category
+        category = self.get_stack_category(stack_name)
+        
+        return Stack(
+            name=stack_name.title(),
+            language=config.get('language', 'Unknown'),
+            docs_url=config['docs_url'],
+            github_url=f"https://github.com/{config['github']}" if 'github' in config else None,
+            install=install_commands,
+            last_checked=datetime.now(),
+            category=category,
+            last_updated=datetime.now(),
+            stale_fields=stale_fields,
+            **fields
+        )
+    
+    def stale_sources(self, stack: Stack) -> List[str]:
+        """Sources whose fields are stale in stack, for retrying just those"""
+        return [source for source, fields in SOURCE_FIELDS.items() if set(fields) & set(stack.stale_fields)]
+    
+    def refetch_source(self, stack_name: str, source: str) -> Dict[str, Any]:
+        """Re-fetch one source of a stack, returning its fields; raises if it fails again"""
+        return self._fetch_source(source, stack_name, self.config['sources'][stack_name])
+    
+    def merge_source(self, stack: Stack, source: str, fields: Dict[str, Any]) -> Stack:
+        """Stack with one source's re-fetched fields applied and no longer stale
+        
+        Only that source's fields change; last_checked stays with the last
+        full crawl, since the other sources weren't checked.
+        """
+        return stack.model_copy(update={
+            **{field: fields[field] for field in SOURCE_FIELDS[source] if field in fields},
+            'stale_fields': [field for field in stack.stale_fields if field not in SOURCE_FIELDS[source]]
+        })
+    
+    def crawl_stack(self, stack_name: str, config: Dict[str, Any]) -> Optional[Stack]:
+        """Crawl a single stack and return Stack object with popularity metrics"""
+        try:
+            return self.fetch_stack(stack_name, config)
         except Exception as e:
             print(f"Error crawling {stack_name}: {e}")
             return None
     
+    def stack_names(self, fast_only: bool = False) -> List[str]:
+        """Configured stack names, or only the fast-moving ones"""
+        if fast_only:
+            fast_moving = self.config.get('fast_moving_stacks', [])
+            return [name for name in fast_moving if name in self.config['sources']]
+        return list(self.config['sources'])
+    
+    def select_stack_names(self, names: Optional[List[str]] = None, categories: Optional[List[str]] = None,
+                           fast_only: bool = False) -> List[str]:
+        """Configured stack names matching every given filter (case-insensitive)"""
+        selected = self.stack_names(fast_only=fast_only)
+        if names:
+            wanted = {name.lower() for name in names}
+            selected = [name for name in selected if name.lower() in wanted]
+        if categories:
+            wanted = {category.lower() for category in categories}
+            selected = [name for name in selected if self.get_stack_category(name).value in wanted]
+        return selected
+    
+    def refresh_github_budget(self):
+        """Learn the GitHub REST and GraphQL budgets (the /rate_limit call itself is free)"""
+        try:
+            with self.limiter.slot(GITHUB_RATE_LIMIT):
+                response = self.session.get(GITHUB_RATE_LIMIT, timeout=10,
+                                            headers=self._github_headers(GITHUB_RATE_LIMIT))
+            response.raise_for_status()
+            resources = response.json().get('resources', {})
+        except Exception as e:
+            print(f"Error fetching GitHub rate limit: {e}")
+            return
+        for resource, key in (('core', 'api.github.com'), ('graphql', 'api.github.com/graphql')):
+            window = resources.get(resource)
+            if window:
+                self.governor.set_budget(key, window['limit'], window['remaining'], window['reset'])
+    
+    def _request_costs(self, config: Dict[str, Any], github: Optional[Dict[str, Any]],
+                       npm_downloads: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        """Upper bound on the requests fetch_stack() sends per rate budget"""
+        costs: Dict[str, int] = {}
+        if 'npm' in config:
+            costs['registry.npmjs.org'] = 1
+            if npm_downloads is None:
+                costs['api.npmjs.org'] = 1
+        if 'pypi' in config:
+            costs['pypi.org'] = 1
+            costs['pypistats.org'] = 1
+        if 'github' in config and github is None:
+            # Stats, plus the release when no registry has a version
+            costs['api.github.com'] = 2
+        return costs
+    
+    def crawl_many(self, names: List[str], previous: Optional[Dict[str, Stack]] = None
+                   ) -> Iterator[Tuple[str, Optional[Stack], Optional[Exception]]]:
+        """Crawl stacks concurrently, yielding (name, stack, error) as each one finishes
+        
+        Stacks the known rate budgets can't cover are yielded straight away
+        with a RateLimited error, to be crawled after the reset. previous maps
+        names to their stored stacks, whose values fill in for failed sources.
+        """
+        previous = previous or {}
+        sources = self.config.get('sources', {})
+        if any('github' in sources.get(name, {}) for name in names):
+            self.refresh_github_budget()
+        # One GraphQL query per batch of repos instead of two REST calls per stack,
+        # and one npm downloads request per batch of packages
+        github = self.prefetch_github(names)
+        npm_downloads = self.prefetch_npm_downloads(names)
+        
+        prefetched = {}
+        for name in names:
+            if name not in sources:
+                yield name, None, KeyError(f"{name} is not a configured source")
+                continue
+            config = sources[name]
+            prefetched[name] = (github.get(config.get('github')), npm_downloads.get(config.get('npm')))
+        admitted, deferred = self.governor.plan({
+            name: self._request_costs(sources[name], *entries) for name, entries in prefetched.items()
+        })
+        if deferred:
+            print(f"Deferring {len(deferred)} stacks until rate limits reset")
+        for name, reason in deferred.items():
+            yield name, None, reason
+        
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='crawl')
+        try:
+            futures = {}
+            for name in admitted:
+                future = pool.submit(self.fetch_stack, name, sources[name], *prefetched[name], previous.get(name))
+                futures[future] = name
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+        finally:
+            # A consumer that stops early shouldn't wait for the rest of the crawl
+            pool.shutdown(wait=False, cancel_futures=True)
+    
     def crawl_all_stacks(self) -> Dict[str, Stack]:
         """Crawl all configured stacks"""
         stacks = {}
         
-        for stack_name, config in self.config['sources'].items():
-            print(f"Crawling {stack_name}...")
-            stack = self.crawl_stack(stack_name, config)
+        print(f"Crawling {len(self.config['sources'])} stacks ({self.concurrency} at a time)...")
+        for stack_name, stack, error in self.crawl_many(self.stack_names()):
             if stack:
                 stacks[stack_name] = stack
                 print(f"✓ {stack_name}: v{stack.latest_version} ({stack.github_stars:,} ⭐)")
             else:
-                print(f"✗ Failed to crawl {stack_name}")
+                print(f"✗ Failed to crawl {stack_name}: {error}")
         
         return stacks
     
     def crawl_fast_moving_stacks(self) -> Dict[str, Stack]:
         """Crawl only fast-moving stacks for daily updates"""
-        fast_moving = self.config.get('fast_moving_stacks', [])
+        fast_moving = self.stack_names(fast_only=True)
         stacks = {}
         
         print(f"Crawling {len(fast_moving)} fast-moving stacks...")
-        for stack_name in fast_moving:
-            if stack_name in self.config['sources']:
-                config = self.config['sources'][stack_name]
-                print(f"Crawling {stack_name}...")
-                stack = self.crawl_stack(stack_name, config)
-                if stack:
-                    stacks[stack_name] = stack
-                    print(f"✓ {stack_name}: v{stack.latest_version}")
-                else:
-                    print(f"✗ Failed to crawl {stack_name}")
+        for stack_name, stack, error in self.crawl_many(fast_moving):
+            if stack:
+                stacks[stack_name] = stack
+                print(f"✓ {stack_name}: v{stack.latest_version}")
+            else:
+                print(f"✗ Failed to crawl {stack_name}: {error}")
         
-        return stacks
\ No newline at end of file
+        return stacks
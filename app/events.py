@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+
+def _format_event(seq: int, event_type: str, data: Dict[str, Any]) -> bytes:
+    payload = json.dumps(data, default=str, separators=(',', ':'))
+    return f"id: {seq}\nevent: {event_type}\ndata: {payload}\n\n".encode()
+
+
+class EventBroadcaster:
+    """In-process fan-out of server events to Server-Sent Events subscribers
+
+    publish() only appends to a bounded ring buffer and wakes subscribers,
+    so it never blocks on a slow client. Each subscriber reads the ring at
+    its own pace; one that falls more than buffer_size events behind gets
+    a final "dropped" event and is disconnected, and should resync (e.g.
+    via /stacks/changes) before reconnecting.
+    """
+
+    def __init__(self, buffer_size: int = 256, heartbeat: float = 15.0):
+        self.heartbeat = heartbeat
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """Append an event and wake every subscriber; safe from any thread"""
+        with self._lock:
+            self._seq += 1
+            self._buffer.append((self._seq, _format_event(self._seq, event_type, data)))
+            waiters = list(self._waiters)
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # The subscriber's event loop has already closed
+                pass
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._waiters)
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Yield encoded SSE messages after last_event_id (or from now on)"""
+        wake = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wake)
+        with self._lock:
+            self._waiters.add(waiter)
+            last = self._seq
+        if last_event_id and last_event_id.isdigit():
+            last = min(int(last_event_id), last)
+
+        try:
+            while True:
+                wake.clear()
+                with self._lock:
+                    oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+                    pending = [(seq, message) for seq, message in self._buffer if seq > last]
+                    current = self._seq
+
+                if last < oldest - 1:
+                    # Events this subscriber never saw have left the ring
+                    yield _format_event(current, 'dropped', {'reason': 'subscriber fell behind'})
+                    return
+
+                for seq, message in pending:
+                    yield message
+                    last = seq
+
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies and the tunnel from closing idle streams
+                    yield b": keep-alive\n\n"
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+# Global broadcaster for crawl and stack update events
+stack_events = EventBroadcaster(int(os.getenv("EVENT_BUFFER_SIZE", "256")))
@@ -0,0 +1,140 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from models import Stack
+from ranking import RANK_METRICS
+
+
+def _bits_from_positions(positions: Iterable[int], size: int) -> int:
+    """Pack bit positions into an int bitset in O(size / 8 + k)"""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _positions_from_bits(bits: int, size: int) -> List[int]:
+    """Unpack an int bitset into ascending bit positions"""
+    positions = []
+    for index, byte in enumerate(bits.to_bytes((size + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            positions.append((index << 3) + low.bit_length() - 1)
+            byte ^= low
+    return positions
+
+
+class NumericColumn:
+    """Values sorted ascending alongside the stack positions they belong to"""
+
+    __slots__ = ('values', 'positions', 'size')
+
+    def __init__(self, values: List[float]):
+        order = sorted(range(len(values)), key=values.__getitem__)
+        self.values = [values[i] for i in order]
+        self.positions = order
+        self.size = len(values)
+
+    def between(self, low: Optional[float] = None, high: Optional[float] = None) -> int:
+        """Bitset of positions with low <= value <= high"""
+        lo = 0 if low is None else bisect_left(self.values, low)
+        hi = self.size if high is None else bisect_right(self.values, high)
+        return _bits_from_positions(self.positions[lo:hi], self.size)
+
+    def below(self, high: float) -> int:
+        """Bitset of positions with value < high"""
+        return _bits_from_positions(self.positions[:bisect_left(self.values, high)], self.size)
+
+
+class FacetIndex:
+    """Per-facet bitsets and sorted numeric columns for combined filtering
+
+    Bit i of every bitset refers to self._keys[i]. Category and language
+    filters OR the bitsets of the selected values; numeric ranges are
+    resolved by binary search on sorted columns; everything is then ANDed.
+    """
+
+    def __init__(self, stacks: Mapping[str, Stack]):
+        self._keys = sorted(stacks)
+        size = len(self._keys)
+        self._all = (1 << size) - 1
+
+        category_positions: Dict[str, List[int]] = {}
+        language_positions: Dict[str, List[int]] = {}
+        self._language_labels: Dict[str, str] = {}
+        stars, downloads, forks, checked = [], [], [], []
+        self._scores: Dict[str, List[float]] = {metric: [] for metric in RANK_METRICS}
+
+        for position, key in enumerate(self._keys):
+            stack = stacks[key]
+            category_positions.setdefault(stack.category.value, []).append(position)
+            language = stack.language.lower()
+            self._language_labels.setdefault(language, stack.language)
+            language_positions.setdefault(language, []).append(position)
+            stars.append(stack.github_stars or 0)
+            downloads.append(stack.downloads_weekly or 0)
+            forks.append(stack.github_forks or 0)
+            # Never-checked stacks sort as the oldest
+            checked.append(stack.last_checked.timestamp() if stack.last_checked else float('-inf'))
+            for metric, score_of in RANK_METRICS.items():
+                self._scores[metric].append(score_of(stack))
+
+        self._categories = {
+            value: _bits_from_positions(positions, size) for value, positions in category_positions.items()
+        }
+        self._languages = {
+            value: _bits_from_positions(positions, size) for value, positions in language_positions.items()
+        }
+        self._stars = NumericColumn(stars)
+        self._downloads = NumericColumn(downloads)
+        self._forks = NumericColumn(forks)
+        self._checked = NumericColumn(checked)
+
+    def _any_of(self, bitsets: Dict[str, int], values: Optional[List[str]]) -> int:
+        if not values:
+            return self._all
+        bits = 0
+        for value in values:
+            bits |= bitsets.get(value.lower(), 0)
+        return bits
+
+    def _counts(self, bitsets: Dict[str, int], within: int, labels: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+        counts = {}
+        for value, bits in bitsets.items():
+            count = (bits & within).bit_count()
+            if count:
+                counts[labels[value] if labels else value] = count
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def query(self, categories: Optional[List[str]] = None, languages: Optional[List[str]] = None,
+              min_stars: Optional[int] = None, max_stars: Optional[int] = None,
+              min_downloads: Optional[int] = None, max_downloads: Optional[int] = None,
+              min_forks: Optional[int] = None, max_forks: Optional[int] = None,
+              checked_before: Optional[datetime] = None,
+              sort_by: str = "stars") -> Tuple[List[str], Dict[str, Dict[str, int]]]:
+        """Return matching stack keys (best first by sort_by) and facet counts"""
+        numeric = self._all
+        if min_stars is not None or max_stars is not None:
+            numeric &= self._stars.between(min_stars, max_stars)
+        if min_downloads is not None or max_downloads is not None:
+            numeric &= self._downloads.between(min_downloads, max_downloads)
+        if min_forks is not None or max_forks is not None:
+            numeric &= self._forks.between(min_forks, max_forks)
+        if checked_before is not None:
+            numeric &= self._checked.below(checked_before.timestamp())
+
+        category_bits = self._any_of(self._categories, categories)
+        language_bits = self._any_of(self._languages, languages)
+        matched = numeric & category_bits & language_bits
+
+        # Each facet is counted with every filter applied except its own
+        facets = {
+            'category': self._counts(self._categories, numeric & language_bits),
+            'language': self._counts(self._languages, numeric & category_bits, self._language_labels),
+        }
+
+        positions = _positions_from_bits(matched, len(self._keys))
+
+        scores = self._scores.get(sort_by, self._scores['combined'])
+        positions.sort(key=lambda position: (-scores[position], self._keys[position]))
+        return [self._keys[position] for position in positions], facets
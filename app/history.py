@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional, List, Tuple
+from models import Stack, HistoricalSnapshot, DailyDownloads
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    stack TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    version TEXT NOT NULL,
+    github_stars INTEGER NOT NULL DEFAULT 0,
+    github_forks INTEGER NOT NULL DEFAULT 0,
+    downloads_weekly INTEGER NOT NULL DEFAULT 0,
+    downloads_monthly INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stack, timestamp)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_downloads (
+    stack TEXT NOT NULL,
+    day TEXT NOT NULL,
+    downloads INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stack, day)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """Append-only time series of per-stack version and popularity snapshots"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection per thread, as with SQLiteStorage
+        self._local = threading.local()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executescript(SCHEMA)
+        except Exception as e:
+            print(f"Warning: Could not create history database: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, rows: List[tuple]):
+        if not rows:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                # The (stack, timestamp) key makes re-imports idempotent
+                conn.executemany(
+                    "INSERT OR IGNORE INTO snapshots (stack, timestamp, version, github_stars, "
+                    "github_forks, downloads_weekly, downloads_monthly) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+        except Exception as e:
+            print(f"Error saving history: {e}")
+
+    def record(self, stacks: Dict[str, Stack], timestamp: Optional[datetime] = None):
+        """Append one snapshot per stack, timestamped by its last check"""
+        rows = []
+        for name, stack in stacks.items():
+            observed_at = timestamp or stack.last_checked or datetime.now()
+            rows.append((
+                name,
+                observed_at.isoformat(),
+                stack.latest_version,
+                stack.github_stars or 0,
+                stack.github_forks or 0,
+                stack.downloads_weekly or 0,
+                stack.downloads_monthly or 0
+            ))
+        self._insert(rows)
+
+    def import_snapshots(self, name: str, history: List[Dict]):
+        """Import snapshots from the legacy per-stack embedded history list"""
+        rows = []
+        for entry in history:
+            snapshot = HistoricalSnapshot(**entry)
+            rows.append((
+                name,
+                snapshot.timestamp.isoformat(),
+                snapshot.version,
+                snapshot.github_stars or 0,
+                snapshot.github_forks or 0,
+                snapshot.downloads_weekly or 0,
+                snapshot.downloads_monthly or 0
+            ))
+        self._insert(rows)
+
+    def query(self, name: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              limit: Optional[int] = None) -> List[HistoricalSnapshot]:
+        """Return a stack's snapshots in [start, end), oldest first"""
+        sql = "SELECT * FROM snapshots WHERE stack = ?"
+        params: list = [name]
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(start.isoformat())
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params.append(end.isoformat())
+        sql += " ORDER BY timestamp"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+        except Exception as e:
+            print(f"Error loading history: {e}")
+            return []
+
+        return [
+            HistoricalSnapshot(
+                timestamp=row['timestamp'],
+                version=row['version'],
+                github_stars=row['github_stars'],
+                github_forks=row['github_forks'],
+                downloads_weekly=row['downloads_weekly'],
+                downloads_monthly=row['downloads_monthly']
+            )
+            for row in rows
+        ]
+
+    def import_store(self, db_path: str) -> Tuple[int, int]:
+        """Copy every snapshot and daily download row from another history database
+
+        Returns (snapshots, daily download rows) read. Rows already present
+        are kept, so re-running a migration is harmless.
+        """
+        if os.path.abspath(db_path) == os.path.abspath(self.db_path) or not os.path.exists(db_path):
+            return 0, 0
+        source = sqlite3.connect(db_path, timeout=30)
+        try:
+            snapshots = source.execute(
+                "SELECT stack, timestamp, version, github_stars, github_forks, downloads_weekly, "
+                "downloads_monthly FROM snapshots"
+            ).fetchall()
+            days = source.execute("SELECT stack, day, downloads FROM daily_downloads").fetchall()
+        finally:
+            source.close()
+
+        self._insert(snapshots)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO daily_downloads (stack, day, downloads) VALUES (?, ?, ?)", days
+                )
+        except Exception as e:
+            print(f"Error importing daily downloads: {e}")
+        return len(snapshots), len(days)
+
+    def record_daily_downloads(self, name: str, series: List[Tuple[str, int]]):
+        """Store a stack's (day, downloads) series; later counts for a day replace earlier ones"""
+        if not series:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO daily_downloads (stack, day, downloads) VALUES (?, ?, ?)",
+                    [(name, day, downloads) for day, downloads in series]
+                )
+        except Exception as e:
+            print(f"Error saving daily downloads: {e}")
+
+    def daily_downloads(self, name: str, start: Optional[str] = None,
+                        end: Optional[str] = None) -> List[DailyDownloads]:
+        """Return a stack's daily download counts for days in [start, end], oldest first"""
+        sql = "SELECT day, downloads FROM daily_downloads WHERE stack = ?"
+        params: list = [name]
+        if start is not None:
+            sql += " AND day >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND day <= ?"
+            params.append(end)
+        sql += " ORDER BY day"
+
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+        except Exception as e:
+            print(f"Error loading daily downloads: {e}")
+            return []
+        return [DailyDownloads(day=row['day'], downloads=row['downloads']) for row in rows]
@@ -0,0 +1,112 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Statuses worth retrying: a transient upstream failure. A 429 is not retried
+# here; it goes back to the crawler's RateGovernor, which defers the request
+# instead of sleeping on it while holding the host's limiter slots.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def _parse_host_limits(spec: str) -> Dict[str, int]:
+    """Parse "host=limit,host=limit" (e.g. CRAWL_HOST_LIMITS) into a dict"""
+    limits = {}
+    for item in spec.split(','):
+        host, _, limit = item.strip().partition('=')
+        if host and limit.strip().isdigit():
+            limits[host.strip().lower()] = max(1, int(limit))
+    return limits
+
+
+class RequestLimiter:
+    """Caps in-flight upstream requests globally and per host
+
+    A request takes its host's slot before a global one, so requests queued
+    behind one slow registry don't hold global slots the other hosts could use.
+    """
+
+    def __init__(self, max_requests: Optional[int] = None, per_host: Optional[int] = None,
+                 host_limits: Optional[Dict[str, int]] = None):
+        self.max_requests = max_requests or int(os.getenv("CRAWL_MAX_REQUESTS", "16"))
+        self.per_host = per_host or int(os.getenv("CRAWL_PER_HOST", "4"))
+        if host_limits is None:
+            host_limits = _parse_host_limits(os.getenv("CRAWL_HOST_LIMITS", ""))
+        self.host_limits = host_limits
+        self._global = threading.BoundedSemaphore(self.max_requests)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._hosts.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.host_limits.get(host, self.per_host))
+                self._hosts[host] = semaphore
+            return semaphore
+
+    @contextmanager
+    def slot(self, url: str):
+        """Hold a global and a per-host slot for the duration of one request"""
+        host = (urlsplit(url).hostname or '').lower()
+        with self._host_semaphore(host):
+            with self._global:
+                yield
+
+
+class _CappedRetry(Retry):
+    """Retry that honors Retry-After, but never sleeps longer than retry_after_max"""
+
+    # urllib3 retries a 429 carrying Retry-After even outside status_forcelist
+    RETRY_AFTER_STATUS_CODES = frozenset([503])
+
+    def __init__(self, *args, retry_after_max: float = 60.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after_max = retry_after_max
+
+    def new(self, **kwargs) -> 'Retry':
+        # urllib3 rebuilds the Retry after every attempt; carry the cap along
+        kwargs.setdefault('retry_after_max', self.retry_after_max)
+        return super().new(**kwargs)
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.retry_after_max)
+
+
+def create_session(pool_maxsize: int = 10, retries: Optional[int] = None) -> requests.Session:
+    """Session with keep-alive connection pools per host and retries on 5xx
+
+    Retries back off exponentially with jitter and wait out Retry-After
+    (capped by CRAWL_RETRY_AFTER_MAX). Once retries run out the last
+    response is returned rather than raised, so callers keep handling
+    status codes themselves.
+    """
+    retries = retries if retries is not None else int(os.getenv("CRAWL_RETRIES", "3"))
+    options = dict(
+        retry_after_max=float(os.getenv("CRAWL_RETRY_AFTER_MAX", "60")),
+        total=retries,
+        backoff_factor=float(os.getenv("CRAWL_BACKOFF", "0.5")),
+        status_forcelist=RETRY_STATUSES,
+        # The crawler's only POSTs are GitHub GraphQL queries, which are reads
+        allowed_methods=frozenset(['GET', 'HEAD', 'POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    try:
+        retry = _CappedRetry(backoff_jitter=0.5, backoff_max=30, **options)
+    except TypeError:  # urllib3 < 2 has no jitter and a fixed backoff cap
+        retry = _CappedRetry(**options)
+
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = 'Current-Stack-Tracker'
+    return session
@@ -0,0 +1,324 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from crawler import SOURCE_FIELDS, StackCrawler
+from events import stack_events
+from models import JobResponse, JobStatus, Stack
+from rate_governor import RateLimited
+from storage import create_storage
+
+
+class RefreshJob:
+    """One background crawl of a set of stacks"""
+
+    def __init__(self, kind: str, names: List[str], revalidate: bool = False):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.names = names
+        # Manual refreshes revalidate upstream responses still within their cache TTL
+        self.revalidate = revalidate
+        self.status = JobStatus.QUEUED
+        self.completed = 0
+        self.updated = 0
+        self.errors: Dict[str, str] = {}
+        # Stacks left for a follow-up job once rate limits reset
+        self.deferred: List[str] = []
+        self.resume_at: Optional[datetime] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.done = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def to_response(self) -> JobResponse:
+        return JobResponse(
+            id=self.id,
+            kind=self.kind,
+            status=self.status,
+            total=len(self.names),
+            completed=self.completed,
+            updated=self.updated,
+            errors=dict(self.errors),
+            deferred=list(self.deferred),
+            resume_at=self.resume_at,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at
+        )
+
+
+class SourceRetryQueue:
+    """Re-fetches just the failed source of a stack whose crawl left fields stale
+
+    One entry per (stack, source), first tried SOURCE_RETRY_DELAY seconds
+    after the crawl and backing off exponentially, up to SOURCE_RETRY_ATTEMPTS
+    tries. A rate-limited retry waits for the reset without using an attempt.
+    Entries that run out stay stale until the stack's next crawl.
+    """
+
+    def __init__(self, crawler: StackCrawler, storage, delay: Optional[float] = None,
+                 attempts: Optional[int] = None, commit_lock: Optional[threading.Lock] = None):
+        self.crawler = crawler
+        self.storage = storage
+        # Held while merging into stored stacks, shared with the job commits
+        self.commit_lock = commit_lock or threading.Lock()
+        self.delay = delay if delay is not None else float(os.getenv("SOURCE_RETRY_DELAY", "300"))
+        self.attempts = attempts or int(os.getenv("SOURCE_RETRY_ATTEMPTS", "3"))
+        # (stack name, source) -> {'attempts', 'due', 'error'}
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def sync(self, name: str, stack: Stack):
+        """Queue the stale sources of a freshly stored stack and drop the recovered ones"""
+        stale = set(self.crawler.stale_sources(stack))
+        with self._lock:
+            for source in SOURCE_FIELDS:
+                key = (name, source)
+                if source not in stale:
+                    self._entries.pop(key, None)
+                elif key not in self._entries:
+                    self._entries[key] = {'attempts': 0, 'due': time.time() + self.delay, 'error': None}
+
+    def schedule(self):
+        """Arm a timer for the earliest due entry"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._entries:
+                return
+            due = min(entry['due'] for entry in self._entries.values())
+            self._timer = threading.Timer(max(0.0, due - time.time()), self.run_due)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def run_due(self, force: bool = False) -> Tuple[int, int]:
+        """Retry every due entry (all of them when force), returning (recovered, failed)"""
+        now = time.time()
+        with self._lock:
+            due = [key for key, entry in self._entries.items() if force or entry['due'] <= now]
+        if not due:
+            self.schedule()
+            return 0, 0
+
+        stacks = self.storage.get_stacks(list({name for name, _ in due}))
+        fetched: List[Tuple[str, str, Dict[str, Any]]] = []
+        recovered = failed = 0
+        for name, source in due:
+            stack = stacks.get(name)
+            if stack is None or source not in self.crawler.stale_sources(stack):
+                with self._lock:
+                    self._entries.pop((name, source), None)
+                continue
+            try:
+                fetched.append((name, source, self.crawler.refetch_source(name, source)))
+                recovered += 1
+            except Exception as e:
+                failed += 1
+                with self._lock:
+                    entry = self._entries.get((name, source))
+                    if entry is None:
+                        continue
+                    entry['error'] = str(e)
+                    if isinstance(e, RateLimited):
+                        entry['due'] = (e.reset_at or time.time() + self.delay) + 1
+                        continue
+                    entry['attempts'] += 1
+                    if entry['attempts'] >= self.attempts:
+                        del self._entries[(name, source)]
+                        print(f"✗ Giving up on {source} for {name} after {entry['attempts']} retries: {e}")
+                    else:
+                        entry['due'] = time.time() + self.delay * 2 ** entry['attempts']
+
+        if fetched:
+            # Merge into the stacks as stored now, not as read before the
+            # fetches: a crawl may have committed newer values meanwhile
+            with self.commit_lock:
+                current = self.storage.get_stacks(list({name for name, _, _ in fetched}))
+                updated: Dict[str, Stack] = {}
+                for name, source, fields in fetched:
+                    stack = updated.get(name) or current.get(name)
+                    if stack is not None and source in self.crawler.stale_sources(stack):
+                        updated[name] = self.crawler.merge_source(stack, source, fields)
+                if updated:
+                    self.storage.upsert_stacks(updated)
+                generation = self.storage.generation
+            for name, stack in updated.items():
+                self.sync(name, stack)
+                stack_events.publish('stack_updated', {
+                    'job_id': None,
+                    'key': name,
+                    'generation': generation,
+                    'stack': stack.model_dump(mode='json')
+                })
+        if recovered or failed:
+            print(f"🔁 Source retries: {recovered} recovered, {failed} failed, {len(self)} pending")
+        self.schedule()
+        return recovered, failed
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Queued retries, soonest first, for /crawler/retries"""
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1]['due'])
+        return [
+            {
+                'stack': name,
+                'source': source,
+                'fields': list(SOURCE_FIELDS[source]),
+                'attempts': entry['attempts'],
+                'next_attempt': datetime.fromtimestamp(entry['due']).isoformat(timespec='seconds'),
+                'last_error': entry['error']
+            }
+            for (name, source), entry in entries
+        ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RefreshJobManager:
+    """Runs refresh crawls off the request path, one thread per job
+
+    A request for stacks that an active job already covers attaches to that
+    job instead of starting another crawl. Crawled stacks are upserted every
+    batch_size stacks, so readers see progress and a failure late in a long
+    crawl keeps everything fetched before it.
+    """
+
+    def __init__(self, crawler: Optional[StackCrawler] = None, storage=None,
+                 batch_size: Optional[int] = None, keep: int = 50):
+        self.crawler = crawler or StackCrawler()
+        self.storage = storage or create_storage()
+        # Daily npm download series go to this storage's history
+        self.crawler.history = self.crawler.history or self.storage.history
+        self.batch_size = batch_size or int(os.getenv("REFRESH_BATCH_SIZE", "10"))
+        # Failed sources of committed stacks, retried on their own
+        self._commit_lock = threading.Lock()
+        self.retries = SourceRetryQueue(self.crawler, self.storage, commit_lock=self._commit_lock)
+        # Finished jobs kept for GET /jobs/{id}
+        self.keep = keep
+        self._jobs: 'OrderedDict[str, RefreshJob]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, kind: str, names: List[str], revalidate: bool = False) -> Tuple[RefreshJob, bool]:
+        """Start a crawl of names, or return the active job covering them
+
+        revalidate is set for manual refreshes, so responses cached within
+        their TTL are checked with upstream instead of reused. A manual
+        request attaching to a scheduled job switches it to revalidating for
+        the stacks it hasn't fetched yet. Returns (job, created).
+        """
+        with self._lock:
+            wanted = set(names)
+            for job in self._jobs.values():
+                if wanted and job.active and wanted.issubset(job.names):
+                    if revalidate and not job.revalidate:
+                        job.revalidate = True
+                        if job.status == JobStatus.RUNNING:
+                            self.crawler.begin_revalidation()
+                    return job, False
+
+            job = RefreshJob(kind, list(names), revalidate)
+            self._jobs[job.id] = job
+            finished = [job_id for job_id, old in self._jobs.items() if not old.active]
+            for job_id in finished[:max(0, len(finished) - self.keep)]:
+                del self._jobs[job_id]
+
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[RefreshJob]:
+        return self._jobs.get(job_id)
+
+    def _resume_later(self, job: RefreshJob, reset_at: float):
+        """Start a job for the deferred stacks just after their rate limits reset"""
+        delay = max(0.0, reset_at - time.time()) + 1
+        job.resume_at = datetime.fromtimestamp(time.time() + delay)
+        timer = threading.Timer(delay, self.start, (job.kind, list(job.deferred), job.revalidate))
+        timer.daemon = True
+        timer.start()
+        print(f"⏳ Refresh job {job.id}: {len(job.deferred)} stacks deferred until {job.resume_at:%H:%M:%S}")
+
+    def _commit(self, job: RefreshJob, batch: Dict[str, Stack]):
+        if batch:
+            with self._commit_lock:
+                self.storage.upsert_stacks(batch)
+                generation = self.storage.generation
+            job.updated += len(batch)
+            for name, stack in batch.items():
+                self.retries.sync(name, stack)
+                stack_events.publish('stack_updated', {
+                    'job_id': job.id,
+                    'key': name,
+                    'generation': generation,
+                    'stack': stack.model_dump(mode='json')
+                })
+            stack_events.publish('crawl_progress', {
+                'job_id': job.id,
+                'completed': job.completed,
+                'updated': job.updated,
+                'total': len(job.names)
+            })
+
+    def _run(self, job: RefreshJob):
+        """Crawl each stack, committing every batch_size successes"""
+        with self._lock:
+            # start() may upgrade the job to revalidating until it finishes
+            job.status = JobStatus.RUNNING
+            if job.revalidate:
+                self.crawler.begin_revalidation()
+        job.started_at = datetime.now()
+        print(f"🔄 Refresh job {job.id} started: {len(job.names)} stacks ({job.kind})")
+        stack_events.publish('crawl_started', {'job_id': job.id, 'kind': job.kind, 'total': len(job.names)})
+        batch: Dict[str, Stack] = {}
+        reset_at = 0.0
+        try:
+            # Stacks are crawled concurrently and committed in completion order.
+            # Stored stacks keep their values for any source that fails this time.
+            previous = self.storage.get_stacks(job.names)
+            for name, stack, error in self.crawler.crawl_many(job.names, previous):
+                if isinstance(error, RateLimited):
+                    job.deferred.append(name)
+                    reset_at = max(reset_at, error.reset_at or 0)
+                elif error:
+                    job.errors[name] = str(error)
+                else:
+                    batch[name] = stack
+                job.completed += 1
+                if len(batch) >= self.batch_size:
+                    self._commit(job, batch)
+                    batch = {}
+            self._commit(job, batch)
+            self.retries.schedule()
+            if job.deferred:
+                self._resume_later(job, reset_at)
+            job.status = JobStatus.COMPLETED
+        except Exception as e:
+            job.errors['general'] = str(e)
+            job.status = JobStatus.FAILED
+        finally:
+            with self._lock:
+                if job.revalidate:
+                    self.crawler.end_revalidation()
+            job.finished_at = datetime.now()
+            job.done.set()
+        print(f"✅ Refresh job {job.id} {job.status.value}: {job.updated} updated, {len(job.errors)} errors")
+        stack_events.publish('crawl_finished', {
+            'job_id': job.id,
+            'status': job.status.value,
+            'updated': job.updated,
+            'errors': job.errors,
+            'deferred': job.deferred
+        })
+
+
+# Global refresh job manager, shared by the API and the scheduler
+refresh_jobs = RefreshJobManager()
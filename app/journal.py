@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    generation INTEGER NOT NULL,
+    stack TEXT NOT NULL,
+    removed INTEGER NOT NULL DEFAULT 0,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (generation, stack)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_changes_timestamp ON changes (timestamp);
+"""
+
+
+class ChangeJournal:
+    """Which stacks each storage generation upserted or removed
+
+    Every save bumps the generation by exactly one, so a journal that holds
+    every generation in (since, current] can describe the delta exactly;
+    anything less (pruned, or a crash between commit and journal write)
+    means the caller has to fall back to a full resync.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection per thread, as with HistoryStore
+        self._local = threading.local()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executescript(SCHEMA)
+        except Exception as e:
+            print(f"Warning: Could not create change journal: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def write(conn: sqlite3.Connection, generation: int, upserted: Iterable[str],
+              removed: Iterable[str] = (), timestamp: Optional[str] = None):
+        """Journal one generation inside the caller's open transaction"""
+        timestamp = timestamp or datetime.now().isoformat()
+        conn.executemany(
+            "INSERT OR REPLACE INTO changes (generation, stack, removed, timestamp) VALUES (?, ?, ?, ?)",
+            [(generation, name, 0, timestamp) for name in upserted] +
+            [(generation, name, 1, timestamp) for name in removed]
+        )
+
+    def record(self, generation: int, upserted: Iterable[str], removed: Iterable[str] = (),
+               timestamp: Optional[str] = None):
+        """Journal one generation in its own transaction"""
+        try:
+            conn = self._connect()
+            with conn:
+                self.write(conn, generation, upserted, removed, timestamp)
+        except Exception as e:
+            print(f"Error writing change journal: {e}")
+
+    @staticmethod
+    def changes_since(conn: sqlite3.Connection, since: int, current: int) -> Optional[Dict[str, bool]]:
+        """Return {stack: removed} for generations in (since, current]
+
+        Returns None when the journal doesn't cover that whole range.
+        """
+        if since == current:
+            return {}
+        if since > current:
+            # A token from before the data was reset or replaced
+            return None
+        covered = conn.execute(
+            "SELECT COUNT(DISTINCT generation) FROM changes WHERE generation > ? AND generation <= ?",
+            (since, current)
+        ).fetchone()[0]
+        if covered != current - since:
+            return None
+
+        changes: Dict[str, bool] = {}
+        # Later generations overwrite earlier ones, so each stack ends on its latest change
+        rows = conn.execute(
+            "SELECT stack, removed FROM changes WHERE generation > ? AND generation <= ? ORDER BY generation",
+            (since, current)
+        )
+        for stack, removed in rows:
+            changes[stack] = bool(removed)
+        return changes
+
+    @staticmethod
+    def generation_at(conn: sqlite3.Connection, timestamp: datetime) -> int:
+        """Latest journaled generation written at or before timestamp (0 if none)"""
+        row = conn.execute(
+            "SELECT MAX(generation) FROM changes WHERE timestamp <= ?", (timestamp.isoformat(),)
+        ).fetchone()
+        return row[0] or 0
+
+    def since(self, since: int, current: int) -> Optional[Dict[str, bool]]:
+        """{stack: removed} for every change after generation since, or None if unknown"""
+        try:
+            return self.changes_since(self._connect(), since, current)
+        except Exception as e:
+            print(f"Error reading change journal: {e}")
+            return None
+
+    def since_time(self, timestamp: datetime, current: int) -> Optional[Dict[str, bool]]:
+        """Like since(), starting from the generation current at timestamp"""
+        try:
+            conn = self._connect()
+            return self.changes_since(conn, self.generation_at(conn, timestamp), current)
+        except Exception as e:
+            print(f"Error reading change journal: {e}")
+            return None
+
+    def prune(self, before: datetime):
+        """Drop journal entries written before the given time"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM changes WHERE timestamp < ?", (before.isoformat(),))
+        except Exception as e:
+            print(f"Error pruning change journal: {e}")
@@ -1,16 +1,24 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import base64
+import json
 import os
 
 from models import (
-    Stack, StackResponse, RefreshResponse, CategoryResponse, 
-    SearchResponse, TrendingResponse, OutdatedResponse, StackCategory
+    Stack, StackResponse, CategoryResponse, 
+    SearchResponse, TrendingResponse, OutdatedResponse, StackCategory,
+    HistoryResponse, RankResponse, Suggestion, SuggestResponse, QueryResponse,
+    ChangesResponse, BatchRequest, BatchResponse, JobResponse, DownloadsResponse
 )
-from crawler import StackCrawler
-from storage import JSONStorage
+from storage import export_line, stale_stack_names
 from scheduler import scheduler
+from jobs import refresh_jobs
+from events import stack_events
+from ranking import RANK_METRICS
+from response_cache import ResponseCache
 
 app = FastAPI(
     title="Current API",
@@ -28,9 +36,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-storage = JSONStorage()
-crawler = StackCrawler()
+# Initialize components. The refresh jobs write through this same instance,
+# so their commits swap the snapshot in place instead of forcing a re-read.
+storage = refresh_jobs.storage
+# Most names accepted by one /stacks/batch request
+MAX_BATCH_NAMES = 500
+# Largest page one /stacks/query request returns
+MAX_QUERY_LIMIT = 200
+
+response_cache = ResponseCache(
+    int(os.getenv("RESPONSE_CACHE_MB", "64")) * 1024 * 1024,
+    max_age=int(os.getenv("RESPONSE_MAX_AGE", "60"))
+)
+
+def _last_updated() -> Optional[datetime]:
+    last_updated = storage.get_metadata().get('last_updated')
+    try:
+        return datetime.fromisoformat(last_updated) if last_updated else None
+    except ValueError:
+        return None
+
+def _cached_response(request: Request, params: Dict[str, Any], build: Callable[[], Any],
+                     last_modified: Callable[[], Optional[datetime]] = _last_updated,
+                     include: Optional[Dict[str, Any]] = None) -> Response:
+    """Serve a read endpoint's serialized body, rebuilt only when storage changes
+
+    params are the handler's validated parameters: the cache key is built
+    from them and the path only, so query strings the handler ignores
+    (cache busters, reordering) share one entry. Responses carry a content
+    ETag, Last-Modified and Cache-Control, and If-None-Match /
+    If-Modified-Since revalidations get a 304.
+    """
+    values = tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value) for name, value in params.items()
+    ))
+    key = (request.url.path, values)
+    return response_cache.respond(key, storage.generation, request.headers, build, last_modified, include)
+
+def _encode_cursor(sort_by: str, position: Tuple[Any, str]) -> str:
+    """Opaque page token for the (sort value, name) position of the last stack"""
+    raw = json.dumps([sort_by, position[0], position[1]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, name = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort_by:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort_by")
+    # Name order carries no sort value; metric orders need a numeric one
+    if sort_by == "name":
+        valid_value = value is None
+    else:
+        valid_value = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not valid_value or not isinstance(name, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, name
 
 @app.on_event("startup")
 async def startup_event():
@@ -40,8 +103,9 @@ async def startup_event():
     # Initialize storage (creates empty file if needed)
     try:
         storage.ensure_file_exists()
-        existing_stacks = storage.load_stacks()
-        print(f"📚 Loaded {len(existing_stacks)} existing stacks from storage.")
+        # Metadata only: materializing every stack here would defeat compact records
+        total = storage.get_metadata().get('total_count', 0)
+        print(f"📚 Loaded {total} existing stacks from storage.")
     except Exception as e:
         print(f"⚠️ Warning during storage initialization: {e}")
     
@@ -58,6 +122,7 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     scheduler.stop_scheduler()
+    refresh_jobs.crawler.close()
     print("🌊 Current API shutdown complete.")
 
 @app.get("/", response_model=Dict[str, Any])
@@ -71,36 +136,72 @@ async def root():
         "last_updated": metadata.get('last_updated'),
         "endpoints": {
             "list_stacks": "/stacks",
+            "stack_changes": "/stacks/changes?since={generation}",
+            "export_stacks": "/stacks/export.ndjson",
+            "stack_stream": "/stacks/stream",
             "get_stack": "/stacks/{name}",
+            "batch_stacks": "/stacks/batch?names={name},{name}",
+            "stack_rank": "/stacks/{name}/rank",
+            "stack_history": "/stacks/{name}/history",
+            "stack_downloads": "/stacks/{name}/downloads",
             "category_stacks": "/stacks/category/{category}",
-            "search_stacks": "/stacks/search?q={query}",
+            "query_stacks": "/stacks/query?category=&language=&min_stars=",
+            "search_stacks": "/stacks/search?q={query}&limit={limit}",
+            "suggest_stacks": "/stacks/suggest?prefix={prefix}",
             "trending_stacks": "/stacks/trending",
             "outdated_stacks": "/stacks/outdated",
-            "refresh": "/stacks/refresh"
+            "refresh": "/stacks/refresh",
+            "crawler_budget": "/crawler/budget",
+            "crawler_retries": "/crawler/retries",
+            "job_status": "/jobs/{job_id}"
         }
     }
 
 @app.get("/stacks", response_model=StackResponse)
-async def list_stacks():
-    """List all tracked stacks"""
+async def list_stacks(request: Request, fields: Optional[str] = None, sort_by: str = "name",
+                      limit: Optional[int] = None, cursor: Optional[str] = None):
+    """List tracked stacks, optionally projected to some fields and paginated"""
+    valid_sorts = ["name"] + list(RANK_METRICS)
+    if sort_by not in valid_sorts:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by. Must be one of: {valid_sorts}")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    
+    include = None
+    if fields:
+        selected = set(_split_values([fields]))
+        unknown = selected - set(Stack.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {sorted(unknown)}")
+        # Projection happens while serializing, so dropped fields cost nothing
+        include = {field: True for field in StackResponse.model_fields}
+        include['stacks'] = {'__all__': selected}
+    
+    after = _decode_cursor(cursor, sort_by) if cursor else None
+    
     try:
-        stacks = storage.load_stacks()
-        metadata = storage.get_metadata()
+        def build():
+            page, next_after = storage.list_stacks_page(sort_by=sort_by, limit=limit, after=after)
+            metadata = storage.get_metadata()
+            
+            # If no stacks exist, trigger a background refresh
+            if not page and after is None:
+                print("🔄 No stacks found. Consider running /stacks/refresh to populate data.")
+            
+            return StackResponse(
+                stacks=dict(page),
+                total_count=metadata.get('total_count', len(page)),
+                last_refresh=metadata.get('last_updated'),
+                next_cursor=_encode_cursor(sort_by, next_after) if next_after else None
+            )
         
-        # If no stacks exist, trigger a background refresh
-        if not stacks:
-            print("🔄 No stacks found. Consider running /stacks/refresh to populate data.")
-        
-        return StackResponse(
-            stacks=stacks,
-            total_count=len(stacks),
-            last_refresh=metadata.get('last_updated')
-        )
+        params = {'fields': sorted(selected) if fields else None, 'sort_by': sort_by, 'limit': limit, 'after': after}
+        return _cached_response(request, params, build, include=include)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading stacks: {str(e)}")
 
 @app.get("/stacks/category/{category}", response_model=CategoryResponse)
-async def get_stacks_by_category(category: str):
+async def get_stacks_by_category(category: str, request: Request):
     """Get all stacks in a specific category"""
     try:
         # Convert string to enum
@@ -113,47 +214,230 @@ async def get_stacks_by_category(category: str):
         if not category_enum:
             raise HTTPException(status_code=400, detail=f"Invalid category: {category}")
         
-        stacks = storage.get_stacks_by_category(category_enum)
+        def build():
+            stacks = storage.get_stacks_by_category(category_enum)
+            return CategoryResponse(
+                category=category,
+                stacks=stacks,
+                total_count=len(stacks)
+            )
         
-        return CategoryResponse(
-            category=category,
-            stacks=stacks,
-            total_count=len(stacks)
-        )
+        return _cached_response(request, {}, build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading category stacks: {str(e)}")
 
 @app.get("/stacks/search", response_model=SearchResponse)
-async def search_stacks(q: str):
-    """Search stacks by name (fuzzy matching)"""
+async def search_stacks(q: str, request: Request, limit: int = 20):
+    """Search stacks by name, package, language or category (typo tolerant)"""
     try:
-        stacks = storage.search_stacks(q)
+        def build():
+            results = storage.search_stacks_ranked(q, limit=limit)
+            
+            # Stacks keep relevance order in the JSON object
+            return SearchResponse(
+                query=q,
+                stacks={name: stack for name, stack, _ in results},
+                total_count=len(results),
+                scores={name: score for name, _, score in results}
+            )
         
-        return SearchResponse(
-            query=q,
-            stacks=stacks,
-            total_count=len(stacks)
-        )
+        return _cached_response(request, {'q': q, 'limit': limit}, build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching stacks: {str(e)}")
 
+@app.get("/stacks/suggest", response_model=SuggestResponse)
+async def suggest_stacks(prefix: str, limit: int = 10):
+    """Type-ahead suggestions for stack names and package identifiers"""
+    results = storage.suggest_stacks(prefix, limit=limit)
+    return SuggestResponse(
+        prefix=prefix,
+        suggestions=[
+            Suggestion(name=name, category=category, score=score)
+            for name, category, score in results
+        ]
+    )
+
+def _split_values(values: Optional[List[str]]) -> Optional[List[str]]:
+    """Accept both repeated (?category=a&category=b) and comma-separated values"""
+    if not values:
+        return None
+    return [value.strip() for item in values for value in item.split(',') if value.strip()]
+
+@app.get("/stacks/query", response_model=QueryResponse)
+async def query_stacks(
+    request: Request,
+    category: Optional[List[str]] = Query(None),
+    language: Optional[List[str]] = Query(None),
+    min_stars: Optional[int] = None,
+    max_stars: Optional[int] = None,
+    min_downloads: Optional[int] = None,
+    max_downloads: Optional[int] = None,
+    min_forks: Optional[int] = None,
+    max_forks: Optional[int] = None,
+    checked_before: Optional[datetime] = None,
+    sort_by: str = "stars",
+    limit: int = 50,
+    offset: int = 0
+):
+    """Filter stacks on category, language and metric ranges with facet counts"""
+    valid_sorts = list(RANK_METRICS)
+    if sort_by not in valid_sorts:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by. Must be one of: {valid_sorts}")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    limit = min(limit, MAX_QUERY_LIMIT)
+    
+    def build():
+        page, total, facets = storage.query_stacks(
+            limit=limit,
+            offset=offset,
+            categories=_split_values(category),
+            languages=_split_values(language),
+            min_stars=min_stars,
+            max_stars=max_stars,
+            min_downloads=min_downloads,
+            max_downloads=max_downloads,
+            min_forks=min_forks,
+            max_forks=max_forks,
+            checked_before=checked_before,
+            sort_by=sort_by
+        )
+        return QueryResponse(
+            stacks=dict(page),
+            total_count=total,
+            facets=facets,
+            sort_by=sort_by,
+            limit=limit,
+            offset=offset
+        )
+    
+    params = {
+        'category': _split_values(category), 'language': _split_values(language),
+        'min_stars': min_stars, 'max_stars': max_stars, 'min_downloads': min_downloads,
+        'max_downloads': max_downloads, 'min_forks': min_forks, 'max_forks': max_forks,
+        'checked_before': checked_before, 'sort_by': sort_by, 'limit': limit, 'offset': offset
+    }
+    return _cached_response(request, params, build)
+
 @app.get("/stacks/trending", response_model=TrendingResponse)
-async def get_trending_stacks(sort_by: str = "stars", limit: int = 20):
+async def get_trending_stacks(request: Request, sort_by: str = "stars", limit: int = 20, offset: int = 0):
     """Get trending stacks sorted by popularity metrics"""
     try:
-        valid_sorts = ["stars", "downloads", "forks", "combined"]
+        valid_sorts = list(RANK_METRICS)
         if sort_by not in valid_sorts:
             raise HTTPException(status_code=400, detail=f"Invalid sort_by. Must be one of: {valid_sorts}")
         
-        stacks = storage.get_trending_stacks(sort_by=sort_by, limit=limit)
+        def build():
+            stacks = storage.get_trending_stacks(sort_by=sort_by, limit=limit, offset=offset)
+            return TrendingResponse(
+                stacks=stacks,
+                sort_by=sort_by,
+                total_count=len(stacks),
+                offset=offset
+            )
         
-        return TrendingResponse(
+        return _cached_response(request, {'sort_by': sort_by, 'limit': limit, 'offset': offset}, build)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting trending stacks: {str(e)}")
+
+@app.get("/stacks/changes", response_model=ChangesResponse)
+async def get_stack_changes(request: Request, since: Optional[str] = None):
+    """Get stacks upserted or removed since a generation token or ISO timestamp"""
+    since_generation = None
+    since_time = None
+    if since is not None:
+        if since.isdigit():
+            since_generation = int(since)
+        else:
+            try:
+                since_time = datetime.fromisoformat(since.replace('Z', '+00:00'))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="since must be a generation number or an ISO timestamp")
+            if since_time.tzinfo is not None:
+                # The journal is written in server local time
+                since_time = since_time.astimezone().replace(tzinfo=None)
+    
+    def build():
+        stacks, removed, generation, complete = storage.get_changes(
+            since=since_generation, since_time=since_time
+        )
+        return ChangesResponse(
+            since=since,
+            generation=generation,
+            full=not complete,
             stacks=stacks,
-            sort_by=sort_by,
+            removed=removed,
             total_count=len(stacks)
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting trending stacks: {str(e)}")
+    
+    return _cached_response(request, {'since': since}, build)
+
+@app.get("/stacks/export.ndjson")
+async def export_stacks():
+    """Stream every stack as newline-delimited JSON, one stack per line"""
+    def lines():
+        # Batch lines into ~64 KB chunks: each chunk is one hop to a worker
+        # thread, while memory stays bounded by the chunk, not the catalogue
+        chunk = []
+        size = 0
+        for name, stack in storage.iter_stacks():
+            line = export_line(name, stack).encode()
+            chunk.append(line)
+            size += len(line)
+            if size >= 65536:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b''.join(chunk)
+    
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="stacks.ndjson"'}
+    )
+
+def _batch_lookup(names: List[str]) -> BatchResponse:
+    """Resolve a batch of names against storage in one pass"""
+    # Lowercase and de-duplicate, keeping the caller's order
+    keys = list(dict.fromkeys(name.lower() for name in names))
+    if len(keys) > MAX_BATCH_NAMES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_NAMES} names per batch")
+    stacks = storage.get_stacks(keys)
+    return BatchResponse(
+        stacks=stacks,
+        missing=[key for key in keys if key not in stacks],
+        total_count=len(stacks)
+    )
+
+@app.get("/stacks/batch", response_model=BatchResponse)
+async def get_stacks_batch(request: Request, names: List[str] = Query(...)):
+    """Get several stacks at once (?names=react,vue or repeated names=)"""
+    keys = _split_values(names) or []
+    return _cached_response(request, {'names': keys}, lambda: _batch_lookup(keys))
+
+@app.post("/stacks/batch", response_model=BatchResponse)
+async def post_stacks_batch(batch: BatchRequest):
+    """Get several stacks at once, for lists too long for a query string"""
+    return _batch_lookup(batch.names)
+
+@app.get("/stacks/stream")
+async def stream_stack_events(request: Request):
+    """Server-Sent Events for crawl start/progress/finish and each committed stack update"""
+    async def events():
+        async for message in stack_events.subscribe(request.headers.get('last-event-id')):
+            if await request.is_disconnected():
+                break
+            yield message
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so nginx forwards each event immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/stacks/outdated", response_model=OutdatedResponse)
 async def get_outdated_stacks(threshold_days: int = 7):
@@ -170,43 +454,141 @@ async def get_outdated_stacks(threshold_days: int = 7):
         raise HTTPException(status_code=500, detail=f"Error getting outdated stacks: {str(e)}")
 
 @app.get("/stacks/{name}", response_model=Stack)
-async def get_stack(name: str):
+async def get_stack(name: str, request: Request):
     """Get details for a specific stack"""
+    stack = None
+    
+    def build():
+        nonlocal stack
+        stack = storage.get_stack(name.lower())
+        if not stack:
+            raise HTTPException(status_code=404, detail=f"Stack '{name}' not found")
+        return stack
+    
+    # The ETag hashes this stack alone, so it only changes when the stack does
+    return _cached_response(request, {}, build, lambda: stack.last_updated or stack.last_checked)
+
+@app.get("/stacks/{name}/rank", response_model=RankResponse)
+async def get_stack_rank(name: str, sort_by: str = "stars"):
+    """Get a stack's position in the trending ranking for a metric"""
+    valid_sorts = list(RANK_METRICS)
+    if sort_by not in valid_sorts:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by. Must be one of: {valid_sorts}")
+    
     stack = storage.get_stack(name.lower())
-    if not stack:
+    rank = storage.get_rank(name, sort_by=sort_by)
+    if not stack or rank is None:
         raise HTTPException(status_code=404, detail=f"Stack '{name}' not found")
-    return stack
+    
+    return RankResponse(
+        name=name.lower(),
+        sort_by=sort_by,
+        rank=rank,
+        score=RANK_METRICS[sort_by](stack)
+    )
 
-@app.post("/stacks/refresh", response_model=RefreshResponse)
-async def refresh_stacks(fast_only: bool = False):
-    """Manually refresh stack data"""
-    try:
-        print(f"🔄 Manual refresh triggered via API (fast_only={fast_only})...")
-        
-        if fast_only:
-            stacks = crawler.crawl_fast_moving_stacks()
-            # Merge with existing stacks
-            existing_stacks = storage.load_stacks()
-            for name, stack in stacks.items():
-                existing_stacks[name] = stack
-            storage.save_stacks(existing_stacks)
-        else:
-            stacks = crawler.crawl_all_stacks()
-            storage.save_stacks(stacks)
-        
-        return RefreshResponse(
-            success=True,
-            updated_stacks=len(stacks),
-            errors={},
-            timestamp=datetime.now()
-        )
-    except Exception as e:
-        return RefreshResponse(
-            success=False,
-            updated_stacks=0,
-            errors={"general": str(e)},
-            timestamp=datetime.now()
-        )
+@app.get("/stacks/{name}/history", response_model=HistoryResponse)
+async def get_stack_history(name: str, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None, limit: Optional[int] = None):
+    """Get version and popularity history for a stack within a time window"""
+    if not storage.get_stack(name.lower()):
+        raise HTTPException(status_code=404, detail=f"Stack '{name}' not found")
+    
+    snapshots = storage.get_history(name, start=start, end=end, limit=limit)
+    return HistoryResponse(
+        name=name.lower(),
+        snapshots=snapshots,
+        total_count=len(snapshots)
+    )
+
+@app.get("/stacks/{name}/downloads", response_model=DownloadsResponse)
+async def get_stack_downloads(name: str, start: Optional[date] = None, end: Optional[date] = None):
+    """Get a stack's daily npm download counts, as kept by each crawl"""
+    if not storage.get_stack(name.lower()):
+        raise HTTPException(status_code=404, detail=f"Stack '{name}' not found")
+    
+    days = storage.get_daily_downloads(
+        name,
+        start=start.isoformat() if start else None,
+        end=end.isoformat() if end else None
+    )
+    return DownloadsResponse(
+        name=name.lower(),
+        days=days,
+        total_count=len(days)
+    )
+
+@app.post("/stacks/refresh", response_model=JobResponse, status_code=202)
+async def refresh_stacks(
+    fast_only: bool = False,
+    names: Optional[List[str]] = Query(None),
+    category: Optional[List[str]] = Query(None),
+    stale_days: Optional[int] = None
+):
+    """Start a background refresh, or join the one already covering these stacks
+
+    names, category and stale_days narrow the crawl to a subset; when several
+    are given a stack has to match all of them.
+    """
+    crawler = refresh_jobs.crawler
+    names = _split_values(names)
+    categories = _split_values(category)
+
+    if names:
+        unknown = [name for name in names if not crawler.select_stack_names(names=[name])]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown stacks: {', '.join(unknown)}")
+    if categories:
+        valid = {c.value for c in StackCategory}
+        invalid = [c for c in categories if c.lower() not in valid]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid categories: {', '.join(invalid)}")
+    if stale_days is not None and stale_days < 0:
+        raise HTTPException(status_code=400, detail="stale_days must be 0 or more")
+
+    selected = crawler.select_stack_names(names, categories, fast_only)
+    if (names or categories) and not selected:
+        raise HTTPException(status_code=400, detail="No configured stacks match the refresh filters")
+    if stale_days is not None:
+        # Nothing stale is a valid answer: the job completes with zero stacks
+        stale = stale_stack_names(storage, selected, stale_days)
+        selected = [name for name in selected if name in stale]
+
+    if names or categories or stale_days is not None:
+        kind = "targeted"
+    else:
+        kind = "fast" if fast_only else "full"
+
+    job, created = refresh_jobs.start(kind, selected, revalidate=True)
+    if created:
+        print(f"🔄 Manual refresh triggered via API ({kind}, {len(selected)} stacks): job {job.id}")
+    return job.to_response()
+
+@app.get("/crawler/budget", response_model=Dict[str, Any])
+async def crawler_budget():
+    """Remaining upstream rate-limit budget per host, as last reported by each host"""
+    return {
+        "hosts": refresh_jobs.crawler.governor.report(),
+        "checked_at": datetime.now().isoformat()
+    }
+
+@app.get("/crawler/retries", response_model=Dict[str, Any])
+async def crawler_retries():
+    """Sources that failed in a crawl and are queued to be re-fetched on their own"""
+    pending = refresh_jobs.retries.pending()
+    return {
+        "retries": pending,
+        "total_count": len(pending),
+        "checked_at": datetime.now().isoformat()
+    }
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get progress and per-stack errors for a refresh job"""
+    job = refresh_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_response()
 
 @app.get("/health")
 async def health_check():
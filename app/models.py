@@ -1,6 +1,6 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Dict, Optional, List
-from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, List
+from datetime import date, datetime
 from enum import Enum
 
 class StackCategory(str, Enum):
@@ -55,11 +55,67 @@ class Stack(BaseModel):
     last_checked: Optional[datetime] = None
     category: StackCategory = StackCategory.OTHER
     last_updated: Optional[datetime] = None
+    # Fields whose last fetch failed and still hold the previous crawl's value
+    stale_fields: List[str] = []
+
+class InstallRecord(NamedTuple):
+    npm: Optional[str] = None
+    bun: Optional[str] = None
+    pip: Optional[str] = None
+    yarn: Optional[str] = None
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+class StackRecord:
+    """Compact read-only form of a persisted Stack, built without validation
+
+    Exposes the same attributes as Stack (install as a named tuple) so indexes
+    can read it directly; to_stack() materializes a real Stack at the
+    response boundary.
+    """
+
+    __slots__ = tuple(Stack.model_fields)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StackRecord':
+        """Build from data we serialized ourselves; the caller vouches for it"""
+        record = cls()
+        for field in cls.__slots__:
+            setattr(record, field, data.get(field))
+        install = data.get('install') or {}
+        record.install = InstallRecord(**{key: install.get(key) for key in InstallRecord._fields})
+        record.category = StackCategory(data.get('category') or StackCategory.OTHER)
+        record.stale_fields = data.get('stale_fields') or []
+        record.last_checked = _parse_datetime(record.last_checked)
+        record.last_updated = _parse_datetime(record.last_updated)
+        return record
+
+    @classmethod
+    def from_stack(cls, stack: Stack) -> 'StackRecord':
+        record = cls()
+        for field in cls.__slots__:
+            setattr(record, field, getattr(stack, field))
+        record.docs_url = str(stack.docs_url)
+        record.github_url = str(stack.github_url) if stack.github_url else None
+        record.install = InstallRecord(**stack.install.model_dump())
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.__slots__}
+        data['install'] = self.install._asdict()
+        return data
+
+    def to_stack(self) -> Stack:
+        return Stack.model_validate(self, from_attributes=True)
 
 class StackResponse(BaseModel):
     stacks: Dict[str, Stack]
     total_count: int
     last_refresh: Optional[datetime] = None
+    next_cursor: Optional[str] = None
 
 class CategoryResponse(BaseModel):
     category: str
@@ -70,28 +126,100 @@ class SearchResponse(BaseModel):
     query: str
     stacks: Dict[str, Stack]
     total_count: int
+    scores: Dict[str, float] = {}
+
+class Suggestion(BaseModel):
+    name: str
+    category: str
+    score: float
+
+class SuggestResponse(BaseModel):
+    prefix: str
+    suggestions: List[Suggestion]
+
+class QueryResponse(BaseModel):
+    stacks: Dict[str, Stack]
+    total_count: int
+    facets: Dict[str, Dict[str, int]]
+    sort_by: str
+    limit: int
+    offset: int
 
 class TrendingResponse(BaseModel):
     stacks: List[Stack]
     sort_by: str
     total_count: int
+    offset: int = 0
+
+class RankResponse(BaseModel):
+    name: str
+    sort_by: str
+    rank: int
+    score: float
+
+class ChangesResponse(BaseModel):
+    since: Optional[str] = None
+    generation: int
+    full: bool
+    stacks: Dict[str, Stack]
+    removed: List[str]
+    total_count: int
+
+class BatchRequest(BaseModel):
+    names: List[str]
+
+class BatchResponse(BaseModel):
+    stacks: Dict[str, Stack]
+    missing: List[str]
+    total_count: int
 
 class OutdatedResponse(BaseModel):
     stacks: Dict[str, Stack]
     threshold_days: int
     total_count: int
 
-class RefreshResponse(BaseModel):
-    success: bool
-    updated_stacks: int
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: JobStatus
+    total: int
+    completed: int
+    updated: int
     errors: Dict[str, str]
-    timestamp: datetime
+    # Skipped for rate limits; a follow-up job crawls them at resume_at
+    deferred: List[str] = []
+    resume_at: Optional[datetime] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class HistoricalSnapshot(BaseModel):
     timestamp: datetime
     version: str
     github_stars: Optional[int] = 0
+    github_forks: Optional[int] = 0
     downloads_weekly: Optional[int] = 0
+    downloads_monthly: Optional[int] = 0
+
+class HistoryResponse(BaseModel):
+    name: str
+    snapshots: List[HistoricalSnapshot]
+    total_count: int
+
+class DailyDownloads(BaseModel):
+    day: date
+    downloads: int = 0
+
+class DownloadsResponse(BaseModel):
+    name: str
+    days: List[DailyDownloads]
+    total_count: int
 
 class StackWithHistory(Stack):
     history: List[HistoricalSnapshot] = []
\ No newline at end of file
@@ -0,0 +1,80 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from models import Stack
+
+# Popularity metrics accepted by get_trending_stacks(sort_by=...)
+RANK_METRICS: Dict[str, Callable[[Stack], float]] = {
+    'stars': lambda stack: stack.github_stars or 0,
+    'downloads': lambda stack: stack.downloads_weekly or 0,
+    'forks': lambda stack: stack.github_forks or 0,
+    'combined': lambda stack: (stack.github_stars or 0) + (stack.downloads_weekly or 0) / 1000,
+}
+
+
+class RankIndex:
+    """Stack names kept sorted by one metric, highest first
+
+    Entries are (-score, name) so ties break by name and every position is
+    stable between requests. Instances are never mutated once published;
+    with_changes() returns an updated copy for the next storage snapshot.
+    """
+
+    __slots__ = ('metric', '_entries', '_scores')
+
+    def __init__(self, metric: str, entries: List[Tuple[float, str]], scores: Dict[str, float]):
+        self.metric = metric
+        self._entries = entries
+        self._scores = scores
+
+    @classmethod
+    def build(cls, metric: str, stacks: Mapping[str, Stack]) -> 'RankIndex':
+        score_of = RANK_METRICS[metric]
+        scores = {name: score_of(stack) for name, stack in stacks.items()}
+        entries = sorted((-score, name) for name, score in scores.items())
+        return cls(metric, entries, scores)
+
+    def with_changes(self, upserted: Mapping[str, Stack], removed: Iterable[str] = ()) -> 'RankIndex':
+        """Return a copy with the given stacks re-ranked or dropped"""
+        score_of = RANK_METRICS[self.metric]
+        entries = list(self._entries)
+        scores = dict(self._scores)
+
+        for name in list(upserted.keys()) + list(removed):
+            old_score = scores.pop(name, None)
+            if old_score is not None:
+                del entries[bisect_left(entries, (-old_score, name))]
+
+        for name, stack in upserted.items():
+            score = score_of(stack)
+            scores[name] = score
+            insort(entries, (-score, name))
+
+        return RankIndex(self.metric, entries, scores)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def top(self, limit: int, offset: int = 0) -> List[str]:
+        """Names ranked offset+1 .. offset+limit"""
+        return [name for _, name in self._entries[offset:offset + limit]]
+
+    def after(self, score: float, name: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(name, score) pairs ranked after the entry (score, name), for keyset paging"""
+        start = bisect_right(self._entries, (-score, name))
+        end = None if limit is None else start + limit
+        return [(entry_name, -neg_score) for neg_score, entry_name in self._entries[start:end]]
+
+    def rank(self, name: str) -> Optional[int]:
+        """1-based rank of a stack, or None if it isn't indexed"""
+        score = self._scores.get(name)
+        if score is None:
+            return None
+        return bisect_left(self._entries, (-score, name)) + 1
+
+    def score(self, name: str) -> Optional[float]:
+        return self._scores.get(name)
+
+
+def build_rank_indexes(stacks: Mapping[str, Stack]) -> Dict[str, RankIndex]:
+    """Build one RankIndex per popularity metric"""
+    return {metric: RankIndex.build(metric, stacks) for metric in RANK_METRICS}
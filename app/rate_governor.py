@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Seconds a host is assumed throttled after a 429 that doesn't say for how long
+DEFAULT_THROTTLE = 60.0
+
+
+class RateLimited(Exception):
+    """A request was not sent because its host's budget is spent until reset_at"""
+
+    def __init__(self, host: str, reset_at: Optional[float] = None):
+        self.host = host
+        self.reset_at = reset_at
+        until = datetime.fromtimestamp(reset_at).isoformat(timespec='seconds') if reset_at else 'unknown'
+        super().__init__(f"{host} rate limit exhausted until {until}")
+
+
+def _parse_rates(spec: str) -> Dict[str, Tuple[int, float]]:
+    """Parse "host=requests/seconds,..." (CRAWL_RATE_LIMITS) into {host: (requests, seconds)}"""
+    rates = {}
+    for item in spec.split(','):
+        host, _, rate = item.strip().partition('=')
+        count, _, period = rate.partition('/')
+        try:
+            rates[host.strip().lower()] = (int(count), float(period or 1))
+        except ValueError:
+            continue
+    return rates
+
+
+class _Budget:
+    """One host's budget: a learned remaining/reset window and/or a token bucket"""
+
+    __slots__ = ('limit', 'remaining', 'reset_at', 'rate', 'capacity', 'tokens', 'updated', 'sent')
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.rate: Optional[float] = None
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.updated = time.time()
+        self.sent = 0
+
+    def _refresh(self, now: float):
+        if self.reset_at is not None and now >= self.reset_at:
+            # The window has reset; the next response reports the new budget
+            self.remaining = None
+            self.reset_at = None
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> Optional[float]:
+        """Spend one request, or return the seconds until one is available"""
+        self._refresh(now)
+        if self.remaining is not None and self.remaining <= 0:
+            return (self.reset_at or now + DEFAULT_THROTTLE) - now
+        if self.rate and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        if self.remaining is not None:
+            self.remaining -= 1
+        if self.rate:
+            self.tokens -= 1
+        self.sent += 1
+        return None
+
+
+class RateGovernor:
+    """Per-host request budgets shared by every crawler thread
+
+    Hosts that send X-RateLimit-Limit/Remaining/Reset (GitHub) get a budget
+    that is spent locally and corrected by each response; a 429, or a 403
+    with no requests remaining, empties it until the reset or Retry-After.
+    Hosts listed in CRAWL_RATE_LIMITS ("host=requests/seconds") also get a
+    token bucket. A request that can't be covered within max_wait seconds
+    raises RateLimited instead of being sent to fail.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, Tuple[int, float]]] = None, max_wait: Optional[float] = None):
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("CRAWL_RATE_WAIT_MAX", "30"))
+        self._budgets: Dict[str, _Budget] = {}
+        self._lock = threading.Lock()
+        if rates is None:
+            rates = _parse_rates(os.getenv("CRAWL_RATE_LIMITS", ""))
+        for key, (count, period) in rates.items():
+            budget = self._budget(key)
+            budget.rate = count / period
+            budget.capacity = budget.tokens = float(count)
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Budget key for a url: its host, with GitHub GraphQL metered separately from REST"""
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        return f"{host}/graphql" if parts.path.rstrip('/') == '/graphql' else host
+
+    def _budget(self, key: str) -> _Budget:
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = self._budgets[key] = _Budget()
+        return budget
+
+    def acquire(self, url: str):
+        """Wait for budget to send one request to url, or raise RateLimited"""
+        key = self.key(url)
+        while True:
+            now = time.time()
+            with self._lock:
+                wait = self._budget(key).take(now)
+            if wait is None:
+                return
+            if wait > self.max_wait:
+                raise RateLimited(key, now + wait)
+            time.sleep(wait)
+
+    def set_budget(self, key: str, limit: int, remaining: int, reset_at: float):
+        with self._lock:
+            budget = self._budget(key)
+            budget.limit, budget.remaining, budget.reset_at = limit, remaining, reset_at
+
+    def update(self, url: str, status_code: int, headers: Any) -> Optional[RateLimited]:
+        """Learn from a response; returns RateLimited if it was a rate-limit rejection"""
+        key = self.key(url)
+        now = time.time()
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        retry_after = headers.get('Retry-After')
+
+        throttled = status_code == 429 or (status_code == 403 and remaining == '0')
+        with self._lock:
+            budget = self._budget(key)
+            if remaining is not None and reset is not None:
+                try:
+                    budget.limit = int(headers.get('X-RateLimit-Limit') or 0) or budget.limit
+                    budget.remaining = int(remaining)
+                    budget.reset_at = float(reset)
+                except ValueError:
+                    pass
+            if not throttled:
+                return None
+            if retry_after and retry_after.isdigit():
+                budget.reset_at = now + int(retry_after)
+            elif budget.reset_at is None or budget.reset_at <= now:
+                budget.reset_at = now + DEFAULT_THROTTLE
+            budget.remaining = 0
+            return RateLimited(key, budget.reset_at)
+
+    def plan(self, costs: Dict[str, Dict[str, int]]) -> Tuple[List[str], Dict[str, RateLimited]]:
+        """Split work into what the known budgets cover now and what must wait
+
+        costs maps each item to its estimated requests per budget key. Items
+        are admitted cheapest first, so a short budget covers as many as it
+        can. Returns (admitted names in crawl order, {deferred name: reason}).
+        """
+        now = time.time()
+        with self._lock:
+            available = {}
+            for key, budget in self._budgets.items():
+                budget._refresh(now)
+                # Only windows that won't reset while we wait constrain the plan
+                if budget.remaining is not None and budget.reset_at and budget.reset_at - now > self.max_wait:
+                    available[key] = (budget.remaining, budget.reset_at)
+
+        def constrained_cost(name: str) -> int:
+            return sum(count for key, count in costs[name].items() if key in available)
+
+        admitted, deferred = [], {}
+        left = {key: remaining for key, (remaining, _) in available.items()}
+        for name in sorted(costs, key=constrained_cost):
+            short = [key for key, count in costs[name].items() if key in left and left[key] < count]
+            if short:
+                deferred[name] = RateLimited(short[0], available[short[0]][1])
+                continue
+            for key, count in costs[name].items():
+                if key in left:
+                    left[key] -= count
+            admitted.append(name)
+        return admitted, deferred
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Remaining budget per host, for /crawler/budget"""
+        now = time.time()
+        report = {}
+        with self._lock:
+            for key, budget in sorted(self._budgets.items()):
+                budget._refresh(now)
+                report[key] = {
+                    'limit': budget.limit,
+                    'remaining': budget.remaining,
+                    'reset_at': datetime.fromtimestamp(budget.reset_at).isoformat(timespec='seconds')
+                                if budget.reset_at else None,
+                    'rate_per_minute': round(budget.rate * 60, 2) if budget.rate else None,
+                    'tokens': int(budget.tokens) if budget.rate else None,
+                    'sent': budget.sent
+                }
+        return report
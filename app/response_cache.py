@@ -0,0 +1,210 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Suffix appended to the ETag of each compressed representation
+ENCODING_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+
+class CachedBody:
+    """Encoded JSON body with its compressed variants, computed on first use
+
+    etag is a strong validator over the uncompressed body, so it survives
+    storage writes that leave this particular response unchanged.
+    """
+
+    __slots__ = ('body', 'etag', 'last_modified', '_encoded', '_lock')
+
+    def __init__(self, body: bytes, last_modified: Optional[datetime] = None):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.last_modified = last_modified
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Bytes held: the body plus the compressed variants built so far"""
+        return len(self.body) + sum(len(data) for data in self._encoded.values())
+
+    def encoded(self, encoding: str) -> bytes:
+        """Return the body in the given content encoding (br or gzip)"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    if encoding == 'br':
+                        data = brotli.compress(self.body, quality=5)
+                    else:
+                        # mtime=0 keeps the output byte-identical between builds
+                        data = gzip.compress(self.body, compresslevel=6, mtime=0)
+                    self._encoded[encoding] = data
+        return data
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of If-None-Match against any representation of etag"""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        for suffix in ENCODING_SUFFIXES.values():
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)]
+                break
+        if tag == etag:
+            return True
+    return False
+
+
+def _not_modified(headers: Mapping[str, str], entry: CachedBody) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent"""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, entry.etag)
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and entry.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        modified = entry.last_modified
+        if modified.tzinfo is None:
+            modified = modified.astimezone()
+        return modified.replace(microsecond=0) <= since
+    return False
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, preferring br"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class ResponseCache:
+    """Serialized responses for read endpoints, valid for one storage generation
+
+    Entries are keyed by endpoint and validated parameters. Any entry built
+    for an older generation is discarded as soon as a newer one is seen, so a
+    save (here or in another process) invalidates the whole cache. The least
+    recently used entries are evicted once bodies and their compressed
+    variants exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_age: int = 60):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._generation: Optional[int] = None
+        self._entries: 'OrderedDict[Hashable, CachedBody]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, generation: int) -> Optional[CachedBody]:
+        with self._lock:
+            if generation != self._generation:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, generation: int, body: bytes,
+            last_modified: Optional[datetime] = None) -> CachedBody:
+        entry = CachedBody(body, last_modified)
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                # Built from data that has already been superseded
+                return entry
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+            if len(body) > self.max_bytes:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            # Compressed variants grow entries after insertion, so re-total here
+            total = sum(cached.size for cached in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.size
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+
+    def respond(self, key: Hashable, generation: int, request_headers: Mapping[str, str],
+                build: Callable[[], BaseModel],
+                last_modified: Callable[[], Optional[datetime]] = lambda: None,
+                include: Optional[Dict[str, Any]] = None) -> Response:
+        """Serve the cached body for key, building and caching it on a miss
+
+        include is passed to model_dump_json, so projected-away fields are
+        never serialized. Conditional requests are answered with 304 from the
+        cached entry, so a revalidation at an unchanged generation never
+        touches storage.
+        """
+        entry = self.get(key, generation)
+        if entry is None:
+            body = build().model_dump_json(include=include).encode()
+            entry = self.put(key, generation, body, last_modified())
+
+        content = entry.body
+        encoding = None
+        if len(content) >= MIN_COMPRESS_SIZE:
+            encoding = _accepted_encoding(request_headers.get('accept-encoding', ''))
+
+        headers = {
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': f'public, max-age={self.max_age}',
+            # Compressed bytes differ, so each representation gets its own strong tag
+            'ETag': f'"{entry.etag}{ENCODING_SUFFIXES.get(encoding, "")}"',
+        }
+        if entry.last_modified is not None:
+            headers['Last-Modified'] = _http_date(entry.last_modified)
+
+        if _not_modified(request_headers, entry):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            content = entry.encoded(encoding)
+            headers['Content-Encoding'] = encoding
+        return Response(content=content, media_type='application/json', headers=headers)
@@ -2,13 +2,12 @@ import schedule
 import time
 import threading
 from datetime import datetime, timedelta
-from crawler import StackCrawler
-from storage import JSONStorage
+from jobs import refresh_jobs
 
 class StackScheduler:
     def __init__(self):
-        self.crawler = StackCrawler()
-        self.storage = JSONStorage()
+        # Shared with the refresh jobs and the API
+        self.storage = refresh_jobs.storage
         self.running = False
         self.thread = None
     
@@ -16,15 +15,10 @@ class StackScheduler:
         """Job function to update all stacks (weekly)"""
         print(f"[{datetime.now()}] Starting weekly full stack update...")
         try:
-            stacks = self.crawler.crawl_all_stacks()
-            
-            # Merge with existing stacks to preserve history
-            existing_stacks = self.storage.load_stacks()
-            for name, stack in stacks.items():
-                existing_stacks[name] = stack
-            
-            self.storage.save_stacks(existing_stacks)
-            print(f"[{datetime.now()}] Successfully updated {len(stacks)} stacks")
+            # Runs as a refresh job so a concurrent API refresh joins it
+            job, _ = refresh_jobs.start("full", refresh_jobs.crawler.stack_names())
+            job.done.wait()
+            print(f"[{datetime.now()}] Successfully updated {job.updated} stacks")
         except Exception as e:
             print(f"[{datetime.now()}] Error during weekly update: {e}")
     
@@ -32,18 +26,16 @@ class StackScheduler:
         """Job function to update fast-moving stacks (daily)"""
         print(f"[{datetime.now()}] Starting daily fast-moving stack update...")
         try:
-            fast_stacks = self.crawler.crawl_fast_moving_stacks()
-            
-            # Merge with existing stacks
-            existing_stacks = self.storage.load_stacks()
-            for name, stack in fast_stacks.items():
-                existing_stacks[name] = stack
-            
-            self.storage.save_stacks(existing_stacks)
-            print(f"[{datetime.now()}] Successfully updated {len(fast_stacks)} fast-moving stacks")
+            job, _ = refresh_jobs.start("fast", refresh_jobs.crawler.stack_names(fast_only=True))
+            job.done.wait()
+            print(f"[{datetime.now()}] Successfully updated {job.updated} fast-moving stacks")
         except Exception as e:
             print(f"[{datetime.now()}] Error during daily update: {e}")
     
+    def compact_storage_job(self):
+        """Job function to fold the storage change log into its base file (hourly)"""
+        self.storage.compact()
+    
     def start_scheduler(self):
         """Start the background scheduler"""
         if self.running:
@@ -55,12 +47,16 @@ class StackScheduler:
         # Schedule daily updates for fast-moving stacks (every day at 2 AM UTC)
         schedule.every().day.at("02:00").do(self.update_fast_moving_stacks_job)
         
+        # Compact the storage change log hourly
+        schedule.every().hour.do(self.compact_storage_job)
+        
         self.running = True
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
         print("Stack scheduler started:")
         print("  - Weekly full updates: Sundays at 00:00 UTC")
         print("  - Daily fast-moving updates: Every day at 02:00 UTC")
+        print("  - Storage compaction: Hourly")
     
     def stop_scheduler(self):
         """Stop the background scheduler"""
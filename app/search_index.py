@@ -0,0 +1,254 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+from models import Stack
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {
+    'name': 1.0,
+    'package': 0.9,
+    'language': 0.5,
+    'category': 0.5,
+}
+
+# Weight multiplier for a part of a value ("query" in "react-query")
+PART_WEIGHT = 0.85
+
+# Minimum trigram (Dice) similarity for a fuzzy candidate
+MIN_SIMILARITY = 0.3
+
+# Words this short can share no trigram with their typo ("veu" / "vue"), so
+# they are also compared against every indexed term of about their length
+SHORT_WORD = 4
+
+_SPLIT = re.compile(r'[^a-z0-9]+')
+
+
+def _normalize(text: str) -> str:
+    return text.lower().strip()
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, giving up past max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # Adjacent transposition ("recat" -> "react") counts as one edit
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def stack_terms(name: str, stack: Stack) -> Dict[str, List[str]]:
+    """Searchable strings for a stack, grouped by field"""
+    packages = []
+    for command in (stack.install.npm, stack.install.pip):
+        if command:
+            # "npm install @angular/core" -> "@angular/core"
+            packages.append(command.split()[-1])
+    if stack.github_url:
+        packages.append(str(stack.github_url).rstrip('/').split('github.com/')[-1])
+
+    return {
+        'name': [name, stack.name],
+        'package': packages,
+        'language': [stack.language],
+        'category': [stack.category.value],
+    }
+
+
+class SearchIndex:
+    """Trigram postings over stack names, package identifiers, language and category
+
+    Built once per storage generation. A query term matches an indexed term
+    exactly, as a prefix or substring, by trigram similarity, or within a small
+    edit distance for typos; each stack scores its best match per query word.
+    """
+
+    def __init__(self, stacks: Mapping[str, Stack]):
+        # term -> [(stack key, field weight)]
+        self._docs: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        self._popularity: Dict[str, float] = {}
+
+        for key, stack in stacks.items():
+            self._popularity[key] = (stack.github_stars or 0) + (stack.downloads_weekly or 0) / 1000
+            seen = {}
+            for field, values in stack_terms(key, stack).items():
+                weight = FIELD_WEIGHTS[field]
+                for value in values:
+                    value = _normalize(value)
+                    # Index the whole value plus its parts ("next.js" -> "next", "js")
+                    terms = [(value, weight)]
+                    terms += [(part, weight * PART_WEIGHT) for part in _SPLIT.split(value) if part]
+                    for term, term_weight in terms:
+                        if seen.get(term, 0) < term_weight:
+                            seen[term] = term_weight
+            for term, weight in seen.items():
+                self._docs[term].append((key, weight))
+
+        self._cache: Dict[Tuple[str, Optional[int]], List[Tuple[str, float]]] = {}
+        self._terms = sorted(self._docs)
+        self._postings: Dict[str, List[str]] = defaultdict(list)
+        self._by_length: Dict[int, List[str]] = defaultdict(list)
+        for term in self._terms:
+            for gram in _trigrams(term):
+                self._postings[gram].append(term)
+            if len(term) <= SHORT_WORD + 1:
+                self._by_length[len(term)].append(term)
+
+    def _match_terms(self, word: str) -> Dict[str, float]:
+        """Indexed terms matching one query word, with a 0-1 match quality"""
+        matches: Dict[str, float] = {}
+
+        # Prefix matches via binary search over the sorted vocabulary
+        i = bisect_left(self._terms, word)
+        while i < len(self._terms) and self._terms[i].startswith(word):
+            term = self._terms[i]
+            matches[term] = 1.0 if term == word else 0.9
+            i += 1
+
+        # Substring, similarity and typo candidates share at least one trigram
+        query_grams = _trigrams(word)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for term in self._postings.get(gram, ()):
+                shared[term] += 1
+
+        if 3 <= len(word) <= SHORT_WORD:
+            for length in (len(word) - 1, len(word), len(word) + 1):
+                for term in self._by_length.get(length, ()):
+                    shared.setdefault(term, 0)
+
+        max_distance = 1 if len(word) <= SHORT_WORD else 2
+        for term, count in shared.items():
+            if term in matches:
+                continue
+            if len(word) >= 3 and word in term:
+                matches[term] = 0.75
+                continue
+            similarity = 2 * count / (len(query_grams) + len(_trigrams(term)))
+            quality = 0.0
+            distance = _edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                quality = 0.7 - 0.15 * distance
+            elif count >= 2 and len(term) > len(word) + 1:
+                # Typo in a partially typed word: "tailwnd" -> "tailwind..."
+                distance = min(
+                    _edit_distance(word, term[:len(word) + delta], max_distance)
+                    for delta in (-1, 0, 1)
+                )
+                if distance <= max_distance:
+                    quality = 0.6 - 0.15 * distance
+            if similarity >= MIN_SIMILARITY:
+                quality = max(quality, 0.6 * similarity)
+            if quality > 0:
+                matches[term] = quality
+
+        return matches
+
+    def _score_word(self, word: str) -> Dict[str, float]:
+        """Best match score per stack for one query word"""
+        best: Dict[str, float] = {}
+        for term, quality in self._match_terms(word).items():
+            for key, weight in self._docs[term]:
+                score = quality * weight
+                if score > best.get(key, 0):
+                    best[key] = score
+        return best
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return (stack key, relevance 0-100) pairs, best first"""
+        query = _normalize(query)
+        if not query:
+            return []
+        cache_key = (query, limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Score the query as a whole ("next.js") and as the mean of its words
+        # ("react router"), keeping whichever is better for each stack
+        scores = self._score_word(query)
+        words = [word for word in _SPLIT.split(query) if word]
+        if len(words) > 1 or (words and words[0] != query):
+            combined: Dict[str, float] = defaultdict(float)
+            for word in words:
+                for key, score in self._score_word(word).items():
+                    combined[key] += score / len(words)
+            for key, score in combined.items():
+                if score > scores.get(key, 0):
+                    scores[key] = score
+
+        ranked = sorted(
+            scores.items(),
+            key=lambda item: (-item[1], -self._popularity[item[0]], item[0])
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+        results = [(key, round(score * 100, 1)) for key, score in ranked]
+
+        # Type-ahead clients repeat the same prefixes constantly
+        if len(self._cache) >= 1024:
+            self._cache.clear()
+        self._cache[cache_key] = results
+        return results
+
+
+class SuggestIndex:
+    """Sorted array of stack names and package identifiers for type-ahead
+
+    Prefix lookups are two binary searches; matches are ranked by popularity
+    and memoized per prefix until the next storage generation.
+    """
+
+    def __init__(self, stacks: Mapping[str, Stack]):
+        entries = set()
+        self._info: Dict[str, Tuple[str, float]] = {}
+        for key, stack in stacks.items():
+            popularity = (stack.github_stars or 0) + (stack.downloads_weekly or 0) / 1000
+            self._info[key] = (stack.category.value, popularity)
+            terms = stack_terms(key, stack)
+            for value in terms['name'] + terms['package']:
+                entries.add((_normalize(value), key))
+
+        ordered = sorted(entries)
+        self._terms = [term for term, _ in ordered]
+        self._keys = [key for _, key in ordered]
+        self._cache: Dict[Tuple[str, int], List[Tuple[str, str, float]]] = {}
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, float]]:
+        """Return (stack key, category, popularity) for the most popular prefix matches"""
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        cache_key = (prefix, limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        lo = bisect_left(self._terms, prefix)
+        hi = bisect_left(self._terms, prefix + '\uffff', lo)
+        matches = set(self._keys[lo:hi])
+        ranked = heapq.nlargest(limit, matches, key=lambda key: (self._info[key][1], key))
+        results = [(key, self._info[key][0], self._info[key][1]) for key in ranked]
+
+        if len(self._cache) >= 4096:
+            self._cache.clear()
+        self._cache[cache_key] = results
+        return results
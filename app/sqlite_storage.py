@@ -0,0 +1,474 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, Optional, List, Tuple
+from models import Stack, StackCategory, HistoricalSnapshot, StackRecord, DailyDownloads
+from history import HistoryStore
+from journal import ChangeJournal
+from search_index import SearchIndex, SuggestIndex
+from facets import FacetIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stacks (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    language TEXT NOT NULL,
+    latest_version TEXT NOT NULL,
+    release_date TEXT NOT NULL,
+    docs_url TEXT NOT NULL,
+    github_url TEXT,
+    install TEXT NOT NULL,
+    github_stars INTEGER NOT NULL DEFAULT 0,
+    github_forks INTEGER NOT NULL DEFAULT 0,
+    downloads_weekly INTEGER NOT NULL DEFAULT 0,
+    downloads_monthly INTEGER NOT NULL DEFAULT 0,
+    last_checked TEXT,
+    category TEXT NOT NULL,
+    last_updated TEXT,
+    stale_fields TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stacks_category ON stacks (category);
+CREATE INDEX IF NOT EXISTS idx_stacks_github_stars ON stacks (github_stars DESC);
+CREATE INDEX IF NOT EXISTS idx_stacks_downloads_weekly ON stacks (downloads_weekly DESC);
+CREATE INDEX IF NOT EXISTS idx_stacks_github_forks ON stacks (github_forks DESC);
+CREATE INDEX IF NOT EXISTS idx_stacks_combined ON stacks ((github_stars + downloads_weekly / 1000.0) DESC);
+CREATE INDEX IF NOT EXISTS idx_stacks_last_checked ON stacks (last_checked);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+STACK_COLUMNS = (
+    'key', 'name', 'language', 'latest_version', 'release_date', 'docs_url',
+    'github_url', 'install', 'github_stars', 'github_forks', 'downloads_weekly',
+    'downloads_monthly', 'last_checked', 'category', 'last_updated', 'stale_fields'
+)
+
+# Score expressions for get_trending_stacks/get_rank, each backed by an index
+TRENDING_SCORE = {
+    'stars': 'github_stars',
+    'downloads': 'downloads_weekly',
+    'forks': 'github_forks',
+    'combined': '(github_stars + downloads_weekly / 1000.0)',
+}
+TRENDING_ORDER = {metric: f"{score} DESC" for metric, score in TRENDING_SCORE.items()}
+
+
+class SQLiteStorage:
+    """SQLite storage with indexed queries, interchangeable with JSONStorage"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """Initialize storage with Railway-friendly paths"""
+        if db_path is None:
+            db_path = os.getenv("SQLITE_PATH")
+        if db_path is None:
+            if os.getenv("RAILWAY_ENVIRONMENT"):
+                db_path = "/app/data/stacks.db"
+                os.makedirs("/app/data", exist_ok=True)
+            else:
+                db_path = "stacks.db"
+
+        self.file_path = db_path
+        # sqlite3 connections can't be shared across threads, so the API
+        # handlers and the scheduler thread each get their own
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # In-memory indexes derived from the table, valid for one generation
+        self._derived_cache: Tuple[int, Dict[str, Any]] = (-1, {})
+        self.ensure_file_exists()
+        # History lives in its own table of the same database
+        self.history = HistoryStore(db_path)
+        # So does the change journal, written in the same transaction as the stacks
+        self.journal = ChangeJournal(db_path)
+        self.journal_days = int(os.getenv("CHANGE_JOURNAL_DAYS", "30"))
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.file_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ensure_file_exists(self):
+        """Create the database schema if it doesn't exist"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executescript(SCHEMA)
+                columns = {row['name'] for row in conn.execute("PRAGMA table_info(stacks)")}
+                if 'stale_fields' not in columns:
+                    # Databases created before stale_fields existed
+                    conn.execute("ALTER TABLE stacks ADD COLUMN stale_fields TEXT")
+        except Exception as e:
+            print(f"Warning: Could not create storage database: {e}")
+
+    def _row_to_stack(self, row: sqlite3.Row) -> Stack:
+        """Convert a stacks row back to a Stack object"""
+        return Stack(
+            name=row['name'],
+            language=row['language'],
+            latest_version=row['latest_version'],
+            release_date=row['release_date'],
+            docs_url=row['docs_url'],
+            github_url=row['github_url'],
+            install=json.loads(row['install']),
+            github_stars=row['github_stars'],
+            github_forks=row['github_forks'],
+            downloads_weekly=row['downloads_weekly'],
+            downloads_monthly=row['downloads_monthly'],
+            last_checked=row['last_checked'],
+            category=row['category'],
+            last_updated=row['last_updated'],
+            stale_fields=json.loads(row['stale_fields'] or '[]')
+        )
+
+    def _load_records(self) -> Dict[str, StackRecord]:
+        """Load all rows as StackRecords, skipping validation of our own writes"""
+        try:
+            rows = self._connect().execute("SELECT * FROM stacks").fetchall()
+        except Exception as e:
+            print(f"Error loading stacks: {e}")
+            return {}
+        records = {}
+        for row in rows:
+            data = dict(row)
+            data['install'] = json.loads(data['install'])
+            data['stale_fields'] = json.loads(data['stale_fields'] or '[]')
+            records[row['key']] = StackRecord.from_dict(data)
+        return records
+
+    def _stack_to_row(self, name: str, stack: Stack) -> tuple:
+        """Convert a Stack object to a stacks row in STACK_COLUMNS order"""
+        return (
+            name,
+            stack.name,
+            stack.language,
+            stack.latest_version,
+            stack.release_date,
+            str(stack.docs_url),
+            str(stack.github_url) if stack.github_url else None,
+            stack.install.model_dump_json(),
+            stack.github_stars or 0,
+            stack.github_forks or 0,
+            stack.downloads_weekly or 0,
+            stack.downloads_monthly or 0,
+            stack.last_checked.isoformat() if stack.last_checked else None,
+            stack.category.value,
+            stack.last_updated.isoformat() if stack.last_updated else None,
+            json.dumps(stack.stale_fields) if stack.stale_fields else None
+        )
+
+    def _query_stacks(self, sql: str, params: tuple = ()) -> Dict[str, Stack]:
+        """Run a SELECT over stacks and return {key: Stack}"""
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+            return {row['key']: self._row_to_stack(row) for row in rows}
+        except Exception as e:
+            print(f"Error loading stacks: {e}")
+            return {}
+
+    def _get_meta(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: Any):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    def _query_keys(self, keys: List[str]) -> Dict[str, Stack]:
+        """Fetch the given stacks, in the order of keys"""
+        found = {}
+        # Chunk the IN clause to stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            found.update(self._query_stacks(
+                f"SELECT * FROM stacks WHERE key IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            ))
+        return {key: found[key] for key in keys if key in found}
+
+    def _derived(self, key: str, builder: Callable[[Any], Any]) -> Any:
+        """Build an in-memory index over all stacks once per generation"""
+        generation = self.generation
+        cached_generation, cache = self._derived_cache
+        if cached_generation != generation:
+            cache = {}
+            self._derived_cache = (generation, cache)
+        value = cache.get(key)
+        if value is None:
+            # Indexes only read attributes, so skip building validated Stacks
+            value = builder(self._load_records())
+            cache[key] = value
+        return value
+
+    @property
+    def generation(self) -> int:
+        """Monotonic counter bumped on every successful save"""
+        try:
+            return int(self._get_meta(self._connect(), 'generation') or 0)
+        except Exception:
+            return 0
+
+    def load_stacks(self) -> Dict[str, Stack]:
+        """Load all stacks from the database"""
+        return self._query_stacks("SELECT * FROM stacks")
+
+    def _write_stacks(self, conn: sqlite3.Connection, stacks: Dict[str, Stack], removed: List[str] = ()):
+        """Upsert stacks inside an open transaction"""
+        conn.executemany(
+            f"INSERT OR REPLACE INTO stacks ({', '.join(STACK_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(STACK_COLUMNS))})",
+            [self._stack_to_row(name, stack) for name, stack in stacks.items()]
+        )
+        last_updated = datetime.now().isoformat()
+        generation = int(self._get_meta(conn, 'generation') or 0) + 1
+        self._set_meta(conn, 'last_updated', last_updated)
+        self._set_meta(conn, 'generation', generation)
+        ChangeJournal.write(conn, generation, stacks, removed, last_updated)
+
+    def save_stacks(self, stacks: Dict[str, Stack]):
+        """Replace all stacks"""
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                with conn:
+                    removed = [
+                        (row['key'],) for row in conn.execute("SELECT key FROM stacks")
+                        if row['key'] not in stacks
+                    ]
+                    conn.executemany("DELETE FROM stacks WHERE key = ?", removed)
+                    self._write_stacks(conn, stacks, [key for key, in removed])
+            self.history.record(stacks)
+
+        except Exception as e:
+            print(f"Error saving stacks: {e}")
+
+    def upsert_stacks(self, stacks: Dict[str, Stack]):
+        """Insert or update only the given stacks"""
+        if not stacks:
+            return
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                with conn:
+                    self._write_stacks(conn, stacks)
+            self.history.record(stacks)
+
+        except Exception as e:
+            print(f"Error saving stacks: {e}")
+
+    def save_stack(self, name: str, stack: Stack):
+        """Insert or update a single stack"""
+        self.upsert_stacks({name.lower(): stack})
+
+    def load_stack(self, name: str) -> Optional[Stack]:
+        """Load a single stack by name"""
+        return self.get_stack(name)
+
+    def compact(self):
+        """Checkpoint the write-ahead log back into the database file and prune the change journal"""
+        self.journal.prune(datetime.now() - timedelta(days=self.journal_days))
+        try:
+            self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            print(f"Error compacting stacks: {e}")
+
+    def get_stack(self, name: str) -> Optional[Stack]:
+        """Get a specific stack by name"""
+        stacks = self._query_stacks("SELECT * FROM stacks WHERE key = ?", (name.lower(),))
+        return stacks.get(name.lower())
+
+    def get_stacks(self, names: List[str]) -> Dict[str, Stack]:
+        """Get several stacks in one query, in the order requested; unknown names are skipped"""
+        return self._query_keys(names)
+
+    def get_stacks_by_category(self, category: StackCategory) -> Dict[str, Stack]:
+        """Get all stacks in a specific category"""
+        return self._query_stacks("SELECT * FROM stacks WHERE category = ?", (category.value,))
+
+    def search_stacks_ranked(self, query: str, limit: Optional[int] = 20) -> List[Tuple[str, Stack, float]]:
+        """Search stacks with typo tolerance, returning (name, stack, relevance) best first"""
+        results = self._derived('search', SearchIndex).search(query, limit)
+        stacks = self._query_keys([name for name, _ in results])
+        return [(name, stacks[name], score) for name, score in results if name in stacks]
+
+    def search_stacks(self, query: str, limit: Optional[int] = None) -> Dict[str, Stack]:
+        """Search stacks by name, package, language or category (fuzzy matching)"""
+        return {name: stack for name, stack, _ in self.search_stacks_ranked(query, limit)}
+
+    def suggest_stacks(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, float]]:
+        """Get (name, category, popularity) for stacks whose name or package starts with prefix"""
+        return self._derived('suggest', SuggestIndex).suggest(prefix, limit)
+
+    def query_stacks(self, limit: int = 50, offset: int = 0,
+                     **filters) -> Tuple[List[Tuple[str, Stack]], int, Dict[str, Dict[str, int]]]:
+        """Filter stacks on several facets at once; see FacetIndex.query for filters"""
+        keys, facets = self._derived('facets', FacetIndex).query(**filters)
+        stacks = self._query_keys(keys[offset:offset + limit])
+        return list(stacks.items()), len(keys), facets
+
+    def get_trending_stacks(self, sort_by: str = "stars", limit: int = 20, offset: int = 0) -> List[Stack]:
+        """Get trending stacks sorted by popularity metrics"""
+        order = TRENDING_ORDER.get(sort_by, TRENDING_ORDER['combined'])
+        stacks = self._query_stacks(
+            f"SELECT * FROM stacks ORDER BY {order}, key LIMIT ? OFFSET ?", (limit, offset)
+        )
+        return list(stacks.values())
+
+    def list_stacks_page(self, sort_by: str = "name", limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, str]] = None) -> Tuple[List[Tuple[str, Stack]], Optional[Tuple[Any, str]]]:
+        """Get stacks in a stable order, continuing after a (sort value, name) position
+
+        See JSONStorage.list_stacks_page; pages are read with an index seek
+        rather than an OFFSET scan.
+        """
+        fetch = -1 if limit is None else limit + 1
+        if sort_by == "name":
+            sql = "SELECT *, NULL AS score FROM stacks"
+            params: list = []
+            if after:
+                sql += " WHERE key > ?"
+                params.append(after[1])
+            sql += " ORDER BY key LIMIT ?"
+        else:
+            score = TRENDING_SCORE[sort_by]
+            sql = f"SELECT *, {score} AS score FROM stacks"
+            params = []
+            if after:
+                sql += f" WHERE ({score} < ? OR ({score} = ? AND key > ?))"
+                params += [after[0], after[0], after[1]]
+            sql += f" ORDER BY {TRENDING_ORDER[sort_by]}, key LIMIT ?"
+        params.append(fetch)
+
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+        except Exception as e:
+            print(f"Error loading stacks: {e}")
+            return [], None
+
+        next_after = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_after = (rows[-1]['score'], rows[-1]['key'])
+        return [(row['key'], self._row_to_stack(row)) for row in rows], next_after
+
+    def iter_stacks(self, batch_size: int = 500) -> Iterator[Tuple[str, Stack]]:
+        """Yield (name, stack) pairs in name order, one keyset page at a time
+
+        Each page is its own query on the calling thread's connection, so a
+        streaming response may resume the generator from any worker thread.
+        """
+        after = None
+        while True:
+            page, after = self.list_stacks_page("name", batch_size, after)
+            yield from page
+            if after is None:
+                return
+
+    def get_rank(self, name: str, sort_by: str = "stars") -> Optional[int]:
+        """Get a stack's 1-based position for a popularity metric"""
+        score = TRENDING_SCORE.get(sort_by, TRENDING_SCORE['combined'])
+        try:
+            row = self._connect().execute(
+                f"SELECT {score} AS score FROM stacks WHERE key = ?", (name.lower(),)
+            ).fetchone()
+            if row is None:
+                return None
+            # Same tie-break as ORDER BY score DESC, key
+            return self._connect().execute(
+                f"SELECT COUNT(*) + 1 FROM stacks WHERE {score} > ? OR ({score} = ? AND key < ?)",
+                (row['score'], row['score'], name.lower())
+            ).fetchone()[0]
+        except Exception as e:
+            print(f"Error ranking stack: {e}")
+            return None
+
+    def get_outdated_stacks(self, threshold_days: int = 7) -> Dict[str, Stack]:
+        """Get stacks that haven't been checked recently"""
+        threshold_date = datetime.now() - timedelta(days=threshold_days)
+        return self._query_stacks(
+            "SELECT * FROM stacks WHERE last_checked IS NULL OR last_checked < ?",
+            (threshold_date.isoformat(),)
+        )
+
+    def get_metadata(self) -> Dict:
+        """Get storage metadata"""
+        try:
+            conn = self._connect()
+            total = conn.execute("SELECT COUNT(*) FROM stacks").fetchone()[0]
+            return {
+                'last_updated': self._get_meta(conn, 'last_updated'),
+                'total_count': total
+            }
+        except Exception as e:
+            print(f"Warning: Could not read metadata: {e}")
+
+        return {'last_updated': None, 'total_count': 0}
+
+    def get_changes(self, since: Optional[int] = None,
+                    since_time: Optional[datetime] = None) -> Tuple[Dict[str, Stack], List[str], int, bool]:
+        """Get stacks upserted and names removed after a generation or a time
+
+        Returns (stacks, removed, generation, complete); see JSONStorage.get_changes.
+        """
+        generation = self.generation
+        changes = None
+        if since is not None:
+            changes = self.journal.since(since, generation)
+        elif since_time is not None:
+            changes = self.journal.since_time(since_time, generation)
+        if changes is None:
+            return self.load_stacks(), [], generation, False
+
+        stacks = self._query_keys(sorted(name for name, was_removed in changes.items() if not was_removed))
+        removed = sorted(name for name in changes if name not in stacks)
+        return stacks, removed, generation, True
+
+    def get_history(self, name: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, limit: Optional[int] = None) -> List[HistoricalSnapshot]:
+        """Get a stack's popularity history within a time window"""
+        return self.history.query(name.lower(), start=start, end=end, limit=limit)
+
+    def get_daily_downloads(self, name: str, start: Optional[str] = None,
+                            end: Optional[str] = None) -> List[DailyDownloads]:
+        """Get a stack's daily npm download counts between two ISO dates"""
+        return self.history.daily_downloads(name.lower(), start=start, end=end)
+
+    def import_json(self, json_path: str) -> int:
+        """Import stacks, their change log and history from a JSONStorage file
+
+        History comes from the JSON backend's history.db (the snapshots and
+        daily download series) and any legacy history embedded in the file.
+        """
+        from storage import JSONStorage
+
+        # Legacy embedded history only lives in the base file
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        for name, stack_data in data.get('stacks', {}).items():
+            if stack_data.get('history'):
+                self.history.import_snapshots(name, stack_data['history'])
+
+        # Read through JSONStorage so upserts not yet compacted are replayed
+        source = JSONStorage(json_path)
+        snapshot = source.snapshot()
+        stacks = dict(snapshot.stacks)
+        snapshots, days = self.history.import_store(source.history_path)
+        print(f"Imported {snapshots} history snapshots and {days} daily download counts")
+
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                self._write_stacks(conn, stacks)
+                self._set_meta(conn, 'last_updated', snapshot.metadata['last_updated'] or datetime.now().isoformat())
+
+        return len(stacks)
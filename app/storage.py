@@ -1,8 +1,110 @@
 import json
 import os
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
-from models import Stack, StackCategory, HistoricalSnapshot
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Optional, List, Set, Tuple, Union
+from pydantic import BaseModel, ValidationError
+from models import Stack, StackCategory, HistoricalSnapshot, StackRecord, DailyDownloads
+from history import HistoryStore
+from journal import ChangeJournal
+from ranking import RankIndex, build_rank_indexes
+from search_index import SearchIndex, SuggestIndex
+from facets import FacetIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class _StoredFile(BaseModel):
+    """Layout of the stacks JSON file, validated in one pass straight from bytes"""
+    stacks: Dict[str, Stack] = {}
+    last_updated: Optional[str] = None
+    generation: int = 0
+
+
+class _LogEntry(BaseModel):
+    """One line of the change log"""
+    generation: int
+    name: str
+    timestamp: str
+    stack: Stack
+
+
+class RecordView(Mapping):
+    """Read-only mapping that materializes StackRecords into Stacks on access
+
+    The cache_size most recently read Stacks are kept, so hot stacks are
+    validated once per snapshot while full scans don't pin every Stack.
+    """
+
+    def __init__(self, records: Dict[str, StackRecord], cache_size: int = 0):
+        self._records = records
+        self._cache_size = cache_size
+        self._stacks: 'OrderedDict[str, Stack]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> Stack:
+        with self._cache_lock:
+            stack = self._stacks.get(name)
+            if stack is not None:
+                self._stacks.move_to_end(name)
+                return stack
+        stack = self._records[name].to_stack()
+        if self._cache_size:
+            with self._cache_lock:
+                self._stacks[name] = stack
+                if len(self._stacks) > self._cache_size:
+                    self._stacks.popitem(last=False)
+        return stack
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class StorageSnapshot:
+    """Immutable in-memory view of the stacks file at one generation
+
+    records holds what is kept in memory: Stack objects, or compact
+    StackRecords when STORAGE_COMPACT_RECORDS is set. Indexes read records
+    directly; stacks always yields Stack objects.
+    """
+
+    __slots__ = ('records', 'stacks', 'metadata', 'generation', 'signature', 'log_entries',
+                 'rankings', '_derived')
+
+    def __init__(self, records: Dict[str, Union[Stack, StackRecord]], metadata: Dict, generation: int,
+                 signature: Optional[Tuple], log_entries: int = 0,
+                 rankings: Optional[Dict[str, RankIndex]] = None, compact: bool = False,
+                 record_cache: int = 0):
+        self.records = MappingProxyType(records)
+        self.stacks = RecordView(records, record_cache) if compact else self.records
+        self.metadata = MappingProxyType(metadata)
+        self.generation = generation
+        self.signature = signature
+        self.log_entries = log_entries
+        # Rank indexes are carried forward incrementally by upserts
+        self.rankings = rankings if rankings is not None else build_rank_indexes(records)
+        self._derived: Dict[str, Any] = {}
+
+    def derived(self, key: str, builder: Callable[[Any], Any]) -> Any:
+        """Build an index over this snapshot's stacks on first use and keep it"""
+        value = self._derived.get(key)
+        if value is None:
+            # Concurrent first readers may both build; either result is valid
+            value = builder(self.records)
+            self._derived[key] = value
+        return value
+
 
 class JSONStorage:
     """Enhanced JSON file storage with historical data support"""
@@ -13,19 +115,36 @@ class JSONStorage:
         
         # Simplified path logic for Railway
         # Railway runs from /app directory, so use /app/data for persistence
-        if os.getenv("RAILWAY_ENVIRONMENT"):
+        if os.getenv("RAILWAY_ENVIRONMENT") and file_path == "stacks_data.json":
             # Railway production environment
             data_path = "/app/data/stacks.json"
-            history_path = "/app/data/history.json"
+            history_path = "/app/data/history.db"
             # Ensure data directory exists
             os.makedirs("/app/data", exist_ok=True)
         else:
-            # Local development - use current directory
-            data_path = "stacks_data.json"
-            history_path = "history.json"
+            # Local development (or an explicit file) - history sits next to it
+            data_path = file_path
+            history_path = os.path.join(os.path.dirname(file_path), "history.db")
         
         self.file_path = data_path
         self.history_path = history_path
+        self.history = HistoryStore(history_path)
+        # Which stacks each generation changed, for /stacks/changes
+        self.journal = ChangeJournal(history_path)
+        self.journal_days = int(os.getenv("CHANGE_JOURNAL_DAYS", "30"))
+        # Upserts are appended here and folded into file_path by compact()
+        self.log_path = f"{data_path}.log"
+        self.lock_path = f"{data_path}.lock"
+        self.compact_threshold = int(os.getenv("STORAGE_COMPACT_THRESHOLD", "500"))
+        # Keep StackRecords instead of Stack models in memory (less RAM, Stack built per read)
+        self.compact_records = os.getenv("STORAGE_COMPACT_RECORDS", "").lower() in ("1", "true", "yes")
+        # Materialized Stacks kept per snapshot in compact mode
+        self.record_cache = int(os.getenv("STORAGE_RECORD_CACHE", "1000"))
+        # Readers grab the current snapshot without locking; the lock only
+        # serializes reloads and writes (API handlers and the scheduler thread)
+        self._lock = threading.RLock()
+        self._snapshot: Optional[StorageSnapshot] = None
+        self._compaction_thread: Optional[threading.Thread] = None
         self.ensure_file_exists()
     
     def ensure_file_exists(self):
@@ -37,143 +156,435 @@ class JSONStorage:
             print(f"Warning: Could not create storage file: {e}")
             # Continue anyway - the app can still function
     
-    def load_stacks(self) -> Dict[str, Stack]:
-        """Load stacks from JSON file"""
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and, where supported, processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat(self, path: str) -> Optional[Tuple[int, int, int]]:
         try:
-            with open(self.file_path, 'r') as f:
-                data = json.load(f)
-                stacks = {}
-                for name, stack_data in data.get('stacks', {}).items():
-                    # Convert dict back to Stack object
-                    stacks[name] = Stack(**stack_data)
-                return stacks
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _file_signature(self) -> Tuple:
+        """Return (inode, mtime_ns, size) of the data file and the change log"""
+        return (self._stat(self.file_path), self._stat(self.log_path))
+
+    def _to_record(self, stack: Stack) -> Union[Stack, StackRecord]:
+        return StackRecord.from_stack(stack) if self.compact_records else stack
+
+    def _new_snapshot(self, records: Dict, metadata: Dict, generation: int, log_entries: int = 0,
+                      rankings: Optional[Dict[str, RankIndex]] = None) -> StorageSnapshot:
+        return StorageSnapshot(
+            records, metadata, generation, self._file_signature(), log_entries,
+            rankings, self.compact_records, self.record_cache
+        )
+
+    def _parse_base(self, raw: bytes) -> Tuple[Dict, Optional[str], int]:
+        """Parse the data file with the trusted fast path for our own writes"""
+        if self.compact_records:
+            data = json.loads(raw)
+            records = {name: StackRecord.from_dict(stack_data) for name, stack_data in data.get('stacks', {}).items()}
+        else:
+            # pydantic-core parses and validates in a single native pass,
+            # with no intermediate dicts
+            data = _StoredFile.model_validate_json(raw)
+            records = dict(data.stacks)
+            data = data.model_dump(exclude={'stacks'})
+
+        if b'"history"' in raw:
+            # Legacy embedded history; moved out on the next rewrite
+            for name, stack_data in json.loads(raw).get('stacks', {}).items():
+                if stack_data.get('history'):
+                    self.history.import_snapshots(name, stack_data['history'])
+
+        return records, data.get('last_updated'), data.get('generation', 0)
+
+    def _parse_log_line(self, line: str) -> Tuple[int, str, str, Union[Stack, StackRecord]]:
+        """Parse one change log line into (generation, name, timestamp, record)"""
+        if self.compact_records:
+            entry = json.loads(line)
+            return entry['generation'], entry['name'], entry['timestamp'], StackRecord.from_dict(entry['stack'])
+        entry = _LogEntry.model_validate_json(line)
+        return entry.generation, entry.name, entry.timestamp, entry.stack
+
+    def _read_snapshot(self, signature: Tuple) -> StorageSnapshot:
+        """Parse the data file and replay the change log into a fresh snapshot"""
+        records = {}
+        metadata = {'last_updated': None, 'total_count': 0}
+        generation = 0
+        base_generation = 0
+        log_entries = 0
+        try:
+            if signature[0] is not None:
+                with open(self.file_path, 'rb') as f:
+                    records, metadata['last_updated'], generation = self._parse_base(f.read())
+            base_generation = generation
+
+            if signature[1] is not None:
+                with open(self.log_path, 'r') as f:
+                    for line in f:
+                        try:
+                            entry_generation, name, timestamp, record = self._parse_log_line(line)
+                        except (json.JSONDecodeError, ValidationError):
+                            # A torn final line from a crash mid-append; the
+                            # write was never acknowledged, so drop it
+                            print(f"Warning: Ignoring incomplete change log entry in {self.log_path}")
+                            break
+                        # Entries at or below the base generation were already
+                        # compacted into the data file
+                        if entry_generation <= base_generation:
+                            continue
+                        records[name] = record
+                        metadata['last_updated'] = timestamp
+                        generation = max(generation, entry_generation)
+                        log_entries += 1
         except Exception as e:
             print(f"Error loading stacks: {e}")
-            return {}
-    
+        metadata['total_count'] = len(records)
+        return StorageSnapshot(records, metadata, generation, signature, log_entries,
+                               compact=self.compact_records, record_cache=self.record_cache)
+
+    def snapshot(self) -> StorageSnapshot:
+        """Return the current snapshot, reloading if the files changed on disk"""
+        signature = self._file_signature()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have reloaded (or written) while we waited
+            snapshot = self._snapshot
+            signature = self._file_signature()
+            if snapshot is None or snapshot.signature != signature:
+                snapshot = self._read_snapshot(signature)
+                self._snapshot = snapshot
+            return snapshot
+
+    @property
+    def generation(self) -> int:
+        """Monotonic counter bumped on every successful save"""
+        return self.snapshot().generation
+
+    def load_stacks(self) -> Dict[str, Stack]:
+        """Load stacks from the cached snapshot"""
+        return dict(self.snapshot().stacks)
+
+    def load_stack(self, name: str) -> Optional[Stack]:
+        """Load a single stack by name"""
+        return self.get_stack(name)
+
+    def _write_base(self, records: Dict[str, Union[Stack, StackRecord]], generation: int, last_updated: str):
+        """Atomically rewrite the data file and discard the change log"""
+        stacks_data = {}
+        for name, record in records.items():
+            # Convert Stack objects to dicts for JSON serialization
+            stacks_data[name] = record.to_dict() if isinstance(record, StackRecord) else record.model_dump()
+
+        data = {
+            'stacks': stacks_data,
+            'last_updated': last_updated,
+            'total_count': len(records),
+            'generation': generation
+        }
+
+        # Write to a temp file and rename so readers in other
+        # processes never observe a half-written file
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.file_path)
+
+        # Log entries are now covered by the base generation, so a crash
+        # before this truncate is harmless: replay skips them
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def _repair_log_tail(self):
+        """Truncate a torn final line so the next append starts on a fresh line"""
+        try:
+            with open(self.log_path, 'rb+') as f:
+                end = f.seek(0, os.SEEK_END)
+                pos = end
+                while pos > 0:
+                    step = min(pos, 65536)
+                    f.seek(pos - step)
+                    chunk = f.read(step)
+                    newline = chunk.rfind(b'\n')
+                    if newline != -1:
+                        pos = pos - step + newline + 1
+                        break
+                    pos -= step
+                if pos != end:
+                    f.truncate(pos)
+        except FileNotFoundError:
+            pass
+
     def save_stacks(self, stacks: Dict[str, Stack]):
-        """Save stacks to JSON file with historical snapshots"""
+        """Replace all stacks, rewriting the JSON file"""
         try:
-            # Load existing data to preserve history
-            existing_data = {}
-            if os.path.exists(self.file_path):
-                with open(self.file_path, 'r') as f:
-                    existing_data = json.load(f)
-            
-            # Convert Stack objects to dicts for JSON serialization
-            stacks_data = {}
-            for name, stack in stacks.items():
-                stack_dict = stack.model_dump()
-                
-                # Add historical snapshot if this is an update
-                if name in existing_data.get('stacks', {}):
-                    existing_stack = existing_data['stacks'][name]
-                    history = existing_stack.get('history', [])
-                    
-                    # Add snapshot if version or popularity changed significantly
-                    should_snapshot = (
-                        existing_stack.get('latest_version') != stack.latest_version or
-                        abs(existing_stack.get('github_stars', 0) - stack.github_stars) > 100 or
-                        abs(existing_stack.get('downloads_weekly', 0) - stack.downloads_weekly) > 10000
-                    )
-                    
-                    if should_snapshot:
-                        snapshot = HistoricalSnapshot(
-                            timestamp=datetime.now(),
-                            version=existing_stack.get('latest_version', ''),
-                            github_stars=existing_stack.get('github_stars', 0),
-                            downloads_weekly=existing_stack.get('downloads_weekly', 0)
-                        )
-                        history.append(snapshot.model_dump())
-                        
-                        # Keep only last 10 snapshots
-                        history = history[-10:]
-                    
-                    stack_dict['history'] = history
-                
-                stacks_data[name] = stack_dict
-            
-            data = {
-                'stacks': stacks_data,
-                'last_updated': datetime.now().isoformat(),
-                'total_count': len(stacks)
-            }
-            
-            with open(self.file_path, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-                
+            with self._write_lock():
+                current = self.snapshot()
+                generation = current.generation + 1
+                last_updated = datetime.now().isoformat()
+                records = {name: self._to_record(stack) for name, stack in stacks.items()}
+                self._write_base(records, generation, last_updated)
+                removed = [name for name in current.records if name not in records]
+                self.journal.record(generation, records, removed, last_updated)
+
+                metadata = {'last_updated': last_updated, 'total_count': len(records)}
+                self._snapshot = self._new_snapshot(records, metadata, generation)
+            self.history.record(stacks)
+
         except Exception as e:
             print(f"Error saving stacks: {e}")
-    
+
+    def upsert_stacks(self, stacks: Dict[str, Stack]):
+        """Insert or update the given stacks by appending them to the change log"""
+        if not stacks:
+            return
+        try:
+            with self._write_lock():
+                current = self.snapshot()
+                generation = current.generation + 1
+                last_updated = datetime.now().isoformat()
+
+                records = dict(current.records)
+                lines = []
+                for name, stack in stacks.items():
+                    entry = {
+                        'generation': generation,
+                        'name': name,
+                        'timestamp': last_updated,
+                        'stack': stack.model_dump()
+                    }
+                    records[name] = self._to_record(stack)
+                    lines.append(json.dumps(entry, default=str) + '\n')
+
+                # One write + fsync per batch; replay tolerates a torn tail
+                self._repair_log_tail()
+                with open(self.log_path, 'a') as f:
+                    f.write(''.join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.journal.record(generation, stacks, (), last_updated)
+
+                metadata = {'last_updated': last_updated, 'total_count': len(records)}
+                rankings = {
+                    metric: index.with_changes(stacks)
+                    for metric, index in current.rankings.items()
+                }
+                self._snapshot = self._new_snapshot(
+                    records, metadata, generation, current.log_entries + len(lines), rankings
+                )
+                needs_compaction = self._snapshot.log_entries >= self.compact_threshold
+
+            self.history.record(stacks)
+
+            if needs_compaction:
+                self._compact_in_background()
+
+        except Exception as e:
+            print(f"Error saving stacks: {e}")
+
+    def save_stack(self, name: str, stack: Stack):
+        """Insert or update a single stack"""
+        self.upsert_stacks({name.lower(): stack})
+
+    def compact(self):
+        """Fold the change log into the base JSON file and prune the change journal"""
+        self.journal.prune(datetime.now() - timedelta(days=self.journal_days))
+        try:
+            with self._write_lock():
+                current = self.snapshot()
+                if current.log_entries == 0:
+                    return
+                self._write_base(
+                    dict(current.records), current.generation, current.metadata['last_updated']
+                )
+                self._snapshot = self._new_snapshot(
+                    dict(current.records), dict(current.metadata), current.generation, 0, current.rankings
+                )
+                print(f"Compacted {current.log_entries} change log entries into {self.file_path}")
+        except Exception as e:
+            print(f"Error compacting stacks: {e}")
+
+    def _compact_in_background(self):
+        """Start a compaction thread unless one is already running"""
+        with self._lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+
     def get_stack(self, name: str) -> Optional[Stack]:
         """Get a specific stack by name"""
-        stacks = self.load_stacks()
-        return stacks.get(name.lower())
+        return self.snapshot().stacks.get(name.lower())
+    
+    def get_stacks(self, names: List[str]) -> Dict[str, Stack]:
+        """Get several stacks from one snapshot, in the order requested; unknown names are skipped"""
+        snapshot = self.snapshot()
+        return {name: snapshot.stacks[name] for name in names if name in snapshot.records}
     
     def get_stacks_by_category(self, category: StackCategory) -> Dict[str, Stack]:
         """Get all stacks in a specific category"""
-        stacks = self.load_stacks()
-        return {name: stack for name, stack in stacks.items() if stack.category == category}
+        snapshot = self.snapshot()
+        # Filter on the stored records and only materialize the matches
+        return {
+            name: snapshot.stacks[name]
+            for name, record in snapshot.records.items() if record.category == category
+        }
     
-    def search_stacks(self, query: str) -> Dict[str, Stack]:
-        """Search stacks by name (fuzzy matching)"""
-        stacks = self.load_stacks()
-        query_lower = query.lower()
-        
-        # Exact matches first, then partial matches
-        exact_matches = {name: stack for name, stack in stacks.items() 
-                        if query_lower == name.lower() or query_lower == stack.name.lower()}
-        
-        partial_matches = {name: stack for name, stack in stacks.items() 
-                          if query_lower in name.lower() or query_lower in stack.name.lower()}
-        
-        # Combine results, exact matches first
-        results = {**exact_matches}
-        for name, stack in partial_matches.items():
-            if name not in results:
-                results[name] = stack
-        
-        return results
+    def search_stacks_ranked(self, query: str, limit: Optional[int] = 20) -> List[Tuple[str, Stack, float]]:
+        """Search stacks with typo tolerance, returning (name, stack, relevance) best first"""
+        snapshot = self.snapshot()
+        index = snapshot.derived('search', SearchIndex)
+        return [(name, snapshot.stacks[name], score) for name, score in index.search(query, limit)]
+    
+    def search_stacks(self, query: str, limit: Optional[int] = None) -> Dict[str, Stack]:
+        """Search stacks by name, package, language or category (fuzzy matching)"""
+        return {name: stack for name, stack, _ in self.search_stacks_ranked(query, limit)}
     
-    def get_trending_stacks(self, sort_by: str = "stars", limit: int = 20) -> List[Stack]:
+    def suggest_stacks(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, float]]:
+        """Get (name, category, popularity) for stacks whose name or package starts with prefix"""
+        return self.snapshot().derived('suggest', SuggestIndex).suggest(prefix, limit)
+    
+    def query_stacks(self, limit: int = 50, offset: int = 0,
+                     **filters) -> Tuple[List[Tuple[str, Stack]], int, Dict[str, Dict[str, int]]]:
+        """Filter stacks on several facets at once; see FacetIndex.query for filters"""
+        snapshot = self.snapshot()
+        keys, facets = snapshot.derived('facets', FacetIndex).query(**filters)
+        page = [(key, snapshot.stacks[key]) for key in keys[offset:offset + limit]]
+        return page, len(keys), facets
+    
+    def get_trending_stacks(self, sort_by: str = "stars", limit: int = 20, offset: int = 0) -> List[Stack]:
         """Get trending stacks sorted by popularity metrics"""
-        stacks = list(self.load_stacks().values())
-        
-        if sort_by == "stars":
-            stacks.sort(key=lambda x: x.github_stars or 0, reverse=True)
-        elif sort_by == "downloads":
-            stacks.sort(key=lambda x: x.downloads_weekly or 0, reverse=True)
-        elif sort_by == "forks":
-            stacks.sort(key=lambda x: x.github_forks or 0, reverse=True)
+        snapshot = self.snapshot()
+        # Unknown metrics fall back to the combined score
+        index = snapshot.rankings.get(sort_by, snapshot.rankings['combined'])
+        return [snapshot.stacks[name] for name in index.top(limit, offset)]
+    
+    def list_stacks_page(self, sort_by: str = "name", limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, str]] = None) -> Tuple[List[Tuple[str, Stack]], Optional[Tuple[Any, str]]]:
+        """Get stacks in a stable order, continuing after a (sort value, name) position
+
+        sort_by is "name" (ascending) or a RANK_METRICS key (highest first,
+        ties by name). Returns the page and the position to pass as after
+        for the next one, or None on the last page.
+        """
+        snapshot = self.snapshot()
+        fetch = None if limit is None else limit + 1
+        if sort_by == "name":
+            keys = snapshot.derived('sorted_keys', sorted)
+            start = bisect_right(keys, after[1]) if after else 0
+            positions = [(None, name) for name in keys[start:None if fetch is None else start + fetch]]
         else:
-            # Default to combined score
-            stacks.sort(key=lambda x: (x.github_stars or 0) + (x.downloads_weekly or 0) / 1000, reverse=True)
-        
-        return stacks[:limit]
+            score, name = after if after else (float('inf'), '')
+            positions = [(score, name) for name, score in snapshot.rankings[sort_by].after(score, name, fetch)]
+
+        next_after = None
+        if limit is not None and len(positions) > limit:
+            positions = positions[:limit]
+            next_after = positions[-1]
+        return [(name, snapshot.stacks[name]) for _, name in positions], next_after
+
+    def iter_stacks(self) -> Iterator[Tuple[str, Stack]]:
+        """Yield (name, stack) pairs in name order from one consistent snapshot"""
+        snapshot = self.snapshot()
+        for name in snapshot.derived('sorted_keys', sorted):
+            yield name, snapshot.stacks[name]
+
+    def get_rank(self, name: str, sort_by: str = "stars") -> Optional[int]:
+        """Get a stack's 1-based position for a popularity metric"""
+        snapshot = self.snapshot()
+        index = snapshot.rankings.get(sort_by, snapshot.rankings['combined'])
+        return index.rank(name.lower())
     
     def get_outdated_stacks(self, threshold_days: int = 7) -> Dict[str, Stack]:
         """Get stacks that haven't been checked recently"""
-        stacks = self.load_stacks()
+        snapshot = self.snapshot()
         outdated = {}
         threshold_date = datetime.now() - timedelta(days=threshold_days)
         
-        for name, stack in stacks.items():
-            if not stack.last_checked or stack.last_checked < threshold_date:
-                outdated[name] = stack
+        for name, record in snapshot.records.items():
+            if not record.last_checked or record.last_checked < threshold_date:
+                outdated[name] = snapshot.stacks[name]
         
         return outdated
     
+    def get_history(self, name: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, limit: Optional[int] = None) -> List[HistoricalSnapshot]:
+        """Get a stack's popularity history within a time window"""
+        return self.history.query(name.lower(), start=start, end=end, limit=limit)
+    
+    def get_daily_downloads(self, name: str, start: Optional[str] = None,
+                            end: Optional[str] = None) -> List[DailyDownloads]:
+        """Get a stack's daily npm download counts between two ISO dates"""
+        return self.history.daily_downloads(name.lower(), start=start, end=end)
+
+    def get_changes(self, since: Optional[int] = None,
+                    since_time: Optional[datetime] = None) -> Tuple[Dict[str, Stack], List[str], int, bool]:
+        """Get stacks upserted and names removed after a generation or a time
+
+        Returns (stacks, removed, generation, complete). When the journal
+        can't vouch for the whole range, complete is False and stacks holds
+        every stack so the caller can resync.
+        """
+        snapshot = self.snapshot()
+        changes = None
+        if since is not None:
+            changes = self.journal.since(since, snapshot.generation)
+        elif since_time is not None:
+            changes = self.journal.since_time(since_time, snapshot.generation)
+        if changes is None:
+            return dict(snapshot.stacks), [], snapshot.generation, False
+
+        stacks = {}
+        removed = []
+        for name, was_removed in changes.items():
+            if was_removed or name not in snapshot.records:
+                removed.append(name)
+            else:
+                stacks[name] = snapshot.stacks[name]
+        return stacks, sorted(removed), snapshot.generation, True
+
     def get_metadata(self) -> Dict:
         """Get storage metadata"""
-        try:
-            if os.path.exists(self.file_path):
-                with open(self.file_path, 'r') as f:
-                    data = json.load(f)
-                    return {
-                        'last_updated': data.get('last_updated'),
-                        'total_count': data.get('total_count', 0)
-                    }
-        except Exception as e:
-            print(f"Warning: Could not read metadata: {e}")
-        
-        return {'last_updated': None, 'total_count': 0}
\ No newline at end of file
+        return dict(self.snapshot().metadata)
+
+
+def export_line(name: str, stack: Stack) -> str:
+    """One NDJSON export line: the stack's fields plus its storage key"""
+    # Splice the key into pydantic's own JSON instead of re-encoding a dict
+    return '{"key":' + json.dumps(name) + ',' + stack.model_dump_json()[1:] + '\n'
+
+
+def stale_stack_names(storage, names: List[str], threshold_days: int) -> Set[str]:
+    """Names not checked within threshold_days, including ones never stored"""
+    stale = set(storage.get_outdated_stacks(threshold_days))
+    stored = storage.get_stacks(names)
+    return stale | {name for name in names if name not in stored}
+
+
+def create_storage():
+    """Create the storage backend selected by STORAGE_BACKEND (json or sqlite)"""
+    backend = os.getenv("STORAGE_BACKEND", "json").lower()
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    if backend != "json":
+        print(f"Warning: Unknown STORAGE_BACKEND '{backend}', using json")
+    return JSONStorage()
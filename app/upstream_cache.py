@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    payload BLOB NOT NULL,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Seconds a cached response is reused without asking upstream at all.
+# Release metadata changes at any moment; download counts only daily.
+DEFAULT_TTLS = {
+    'registry.npmjs.org': 3600,
+    'api.npmjs.org': 12 * 3600,
+    'pypi.org': 3600,
+    'pypistats.org': 12 * 3600,
+    'api.github.com': 3600,
+}
+
+
+def _parse_ttls(spec: str) -> Dict[str, int]:
+    """Parse "host=seconds,host=seconds" (UPSTREAM_CACHE_TTLS) into a dict"""
+    ttls = {}
+    for item in spec.split(','):
+        host, _, seconds = item.strip().partition('=')
+        if host and seconds.strip().isdigit():
+            ttls[host.strip().lower()] = int(seconds)
+    return ttls
+
+
+class UpstreamCache:
+    """On-disk cache of upstream JSON responses and their validators
+
+    Within a host's TTL the stored payload is used without a request; after
+    that the request carries If-None-Match / If-Modified-Since and a 304
+    reuses the stored payload, costing no body and, on GitHub, no rate limit.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttls: Optional[Dict[str, int]] = None):
+        if db_path is None:
+            db_path = os.getenv("UPSTREAM_CACHE_PATH")
+        if db_path is None:
+            if os.getenv("RAILWAY_ENVIRONMENT"):
+                db_path = "/app/data/upstream_cache.db"
+            else:
+                db_path = "upstream_cache.db"
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls if ttls is not None else _parse_ttls(os.getenv("UPSTREAM_CACHE_TTLS", "")))
+        # One connection per thread, as with HistoryStore
+        self._local = threading.local()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executescript(SCHEMA)
+        except Exception as e:
+            print(f"Warning: Could not create upstream cache: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ttl(self, url: str) -> int:
+        return self.ttls.get((urlsplit(url).hostname or '').lower(), 0)
+
+    def get(self, url: str) -> Optional[Tuple[Any, Dict[str, str], bool]]:
+        """Return (payload, conditional request headers, fresh) for a cached url"""
+        try:
+            row = self._connect().execute(
+                "SELECT etag, last_modified, payload, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        except Exception as e:
+            print(f"Error reading upstream cache: {e}")
+            return None
+        if row is None:
+            return None
+
+        etag, last_modified, payload, fetched_at = row
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        fresh = time.time() - fetched_at < self.ttl(url)
+        return json.loads(zlib.decompress(payload)), headers, fresh
+
+    def store(self, url: str, payload: Any, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Save a 200 response's parsed body and validators"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (url, etag, last_modified, payload, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (url, etag, last_modified, zlib.compress(json.dumps(payload).encode()), time.time())
+                )
+        except Exception as e:
+            print(f"Error writing upstream cache: {e}")
+
+    def touch(self, url: str):
+        """Restart a url's TTL after upstream confirmed it unchanged (304)"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        except Exception as e:
+            print(f"Error writing upstream cache: {e}")
@@ -22,6 +22,7 @@ export interface Stack {
   last_checked?: string;
   category: StackCategory;
   last_updated?: string;
+  stale_fields?: string[];
 }
 
 export enum StackCategory {
@@ -80,9 +81,17 @@ export interface OutdatedResponse {
   total_count: number;
 }
 
-export interface RefreshResponse {
-  success: boolean;
-  updated_stacks: number;
+export interface JobResponse {
+  id: string;
+  kind: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  total: number;
+  completed: number;
+  updated: number;
   errors: Record<string, string>;
-  timestamp: string;
+  deferred: string[];
+  resume_at?: string;
+  created_at: string;
+  started_at?: string;
+  finished_at?: string;
 }
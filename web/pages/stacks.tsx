@@ -7,6 +7,9 @@ import useSWR from 'swr'
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 const fetcher = (url: string) => fetch(url).then((res) => res.json())
 
+// Only the fields StackCard renders
+const CARD_FIELDS = 'name,language,latest_version,release_date,docs_url,github_url,github_stars,github_forks,downloads_weekly,category,install'
+
 interface Stack {
     name: string
     language: string
@@ -44,7 +47,7 @@ export default function Stacks() {
     const [selectedCategory, setSelectedCategory] = useState('all')
     const [filteredStacks, setFilteredStacks] = useState<Stack[]>([])
 
-    const { data, error, isLoading } = useSWR(`${API_URL}/stacks`, fetcher)
+    const { data, error, isLoading } = useSWR(`${API_URL}/stacks?fields=${CARD_FIELDS}&sort_by=stars`, fetcher)
 
     useEffect(() => {
         if (!data?.stacks) return